@@ -0,0 +1,38 @@
+"""add offer sync state
+
+Revision ID: 06620ac9c95c
+Revises: 672d2d9c24c2
+Create Date: 2026-10-19 10:41:07.115390
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '06620ac9c95c'
+down_revision: str | None = '672d2d9c24c2'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'offer_sync_state',
+        sa.Column(
+            'product_id',
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey('product.id', ondelete='CASCADE'),
+            primary_key=True,
+        ),
+        sa.Column('etag', sa.String(), nullable=True),
+        sa.Column('last_modified', sa.String(), nullable=True),
+        sa.Column('content_length', sa.Integer(), server_default='0', nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('offer_sync_state')
@@ -0,0 +1,41 @@
+"""drop deleted_at from registered index
+
+Revision ID: 3e9b7c15d0a2
+Revises: 8a2c6e4f1b37
+Create Date: 2026-10-20 11:02:37.918245
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '3e9b7c15d0a2'
+down_revision: str | None = '8a2c6e4f1b37'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def _rebuild_registered_index(columns: list[str]) -> None:
+    # Build the replacement first and swap names, so the sync scan always has an index
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_product_registered_new',
+            'product',
+            columns,
+            postgresql_where=sa.text('external_id IS NOT NULL AND deleted_at IS NULL'),
+            postgresql_concurrently=True,
+        )
+        op.drop_index('ix_product_registered', 'product', postgresql_concurrently=True)
+        op.execute('ALTER INDEX ix_product_registered_new RENAME TO ix_product_registered')
+
+
+def upgrade() -> None:
+    # deleted_at is always NULL within the index; keying it only widened every entry
+    _rebuild_registered_index(['id', 'external_id'])
+
+
+def downgrade() -> None:
+    _rebuild_registered_index(['id', 'external_id', 'deleted_at'])
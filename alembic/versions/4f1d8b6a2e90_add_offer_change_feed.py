@@ -0,0 +1,41 @@
+"""add offer change feed
+
+Revision ID: 4f1d8b6a2e90
+Revises: e7a3c9f05b12
+Create Date: 2026-10-19 23:02:41.518306
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '4f1d8b6a2e90'
+down_revision: str | None = 'e7a3c9f05b12'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'offer_change',
+        sa.Column('id', sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column('product_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('offer_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('kind', sa.String(16), nullable=False),
+        sa.Column('old_price', sa.Integer(), nullable=True),
+        sa.Column('new_price', sa.Integer(), nullable=True),
+        sa.Column('old_stock', sa.Integer(), nullable=True),
+        sa.Column('new_stock', sa.Integer(), nullable=True),
+        sa.Column('origin', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index('ix_offer_change_created_at', 'offer_change', ['created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_offer_change_created_at', 'offer_change')
+    op.drop_table('offer_change')
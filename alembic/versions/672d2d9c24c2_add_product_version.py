@@ -0,0 +1,26 @@
+"""add product version
+
+Revision ID: 672d2d9c24c2
+Revises: 3cdb298b2d13
+Create Date: 2026-10-19 09:12:31.402117
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '672d2d9c24c2'
+down_revision: str | None = '3cdb298b2d13'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column('product', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('product', 'version')
@@ -0,0 +1,59 @@
+"""add offer history
+
+Revision ID: 6b0796469e15
+Revises: 06620ac9c95c
+Create Date: 2026-10-19 12:03:52.641028
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '6b0796469e15'
+down_revision: str | None = '06620ac9c95c'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'offer_history',
+        sa.Column('id', sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column(
+            'product_id',
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey('product.id', ondelete='CASCADE'),
+            nullable=False,
+        ),
+        sa.Column('offer_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('price', sa.Integer(), nullable=False),
+        sa.Column('items_in_stock', sa.Integer(), nullable=False),
+        sa.Column('recorded_at', sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index('ix_offer_history_product_recorded_at', 'offer_history', ['product_id', 'recorded_at'])
+    op.create_index('ix_offer_history_recorded_at', 'offer_history', ['recorded_at'], postgresql_using='brin')
+
+    op.create_table(
+        'offer_price_rollup',
+        sa.Column(
+            'product_id',
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey('product.id', ondelete='CASCADE'),
+            primary_key=True,
+        ),
+        sa.Column('bucket_start', sa.DateTime(timezone=True), primary_key=True),
+        sa.Column('min_price', sa.Integer(), nullable=False),
+        sa.Column('max_price', sa.Integer(), nullable=False),
+        sa.Column('samples', sa.Integer(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('offer_price_rollup')
+    op.drop_index('ix_offer_history_recorded_at', 'offer_history')
+    op.drop_index('ix_offer_history_product_recorded_at', 'offer_history')
+    op.drop_table('offer_history')
@@ -0,0 +1,53 @@
+"""add query aligned indexes
+
+Revision ID: 6b3ee8196303
+Revises: 6b0796469e15
+Create Date: 2026-10-19 13:27:44.908152
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '6b3ee8196303'
+down_revision: str | None = '6b0796469e15'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    # Build concurrently so large offer tables stay writable during the migration
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_offer_product_id_price',
+            'offer',
+            ['product_id', 'price'],
+            postgresql_include=['items_in_stock', 'id'],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_offer_in_stock',
+            'offer',
+            ['product_id', 'price'],
+            postgresql_where=sa.text('items_in_stock > 0'),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_product_registered',
+            'product',
+            ['id', 'external_id'],
+            postgresql_where=sa.text('external_id IS NOT NULL'),
+            postgresql_concurrently=True,
+        )
+        # Superseded by the (product_id, price) prefix
+        op.drop_index('ix_offer_product_id', 'offer', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.create_index('ix_offer_product_id', 'offer', ['product_id'])
+    op.drop_index('ix_product_registered', 'product')
+    op.drop_index('ix_offer_in_stock', 'offer')
+    op.drop_index('ix_offer_product_id_price', 'offer')
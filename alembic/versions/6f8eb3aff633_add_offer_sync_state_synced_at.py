@@ -0,0 +1,26 @@
+"""add offer sync state synced_at
+
+Revision ID: 6f8eb3aff633
+Revises: 6b3ee8196303
+Create Date: 2026-10-19 15:18:09.527460
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '6f8eb3aff633'
+down_revision: str | None = '6b3ee8196303'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column('offer_sync_state', sa.Column('synced_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('offer_sync_state', 'synced_at')
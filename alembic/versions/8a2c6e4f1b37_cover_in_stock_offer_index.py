@@ -0,0 +1,41 @@
+"""cover in-stock offer index
+
+Revision ID: 8a2c6e4f1b37
+Revises: 4f1d8b6a2e90
+Create Date: 2026-10-20 09:41:12.604833
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '8a2c6e4f1b37'
+down_revision: str | None = '4f1d8b6a2e90'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def _rebuild_in_stock_index(include: list[str]) -> None:
+    # Build the replacement first and swap names, so in-stock reads always have an index
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_offer_in_stock_new',
+            'offer',
+            ['product_id', 'price'],
+            postgresql_include=include,
+            postgresql_where=sa.text('items_in_stock > 0'),
+            postgresql_concurrently=True,
+        )
+        op.drop_index('ix_offer_in_stock', 'offer', postgresql_concurrently=True)
+        op.execute('ALTER INDEX ix_offer_in_stock_new RENAME TO ix_offer_in_stock')
+
+
+def upgrade() -> None:
+    _rebuild_in_stock_index(['id', 'items_in_stock'])
+
+
+def downgrade() -> None:
+    _rebuild_in_stock_index([])
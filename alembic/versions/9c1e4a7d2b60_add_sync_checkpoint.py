@@ -0,0 +1,34 @@
+"""add sync checkpoint
+
+Revision ID: 9c1e4a7d2b60
+Revises: 6f8eb3aff633
+Create Date: 2026-10-19 17:02:41.318204
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '9c1e4a7d2b60'
+down_revision: str | None = '6f8eb3aff633'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'sync_checkpoint',
+        sa.Column('job', sa.String(length=64), primary_key=True),
+        sa.Column('run_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('last_product_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('sync_checkpoint')
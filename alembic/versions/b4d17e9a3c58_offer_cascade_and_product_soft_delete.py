@@ -0,0 +1,62 @@
+"""offer cascade and product soft delete
+
+Revision ID: b4d17e9a3c58
+Revises: 9c1e4a7d2b60
+Create Date: 2026-10-19 18:11:52.604127
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4d17e9a3c58'
+down_revision: str | None = '9c1e4a7d2b60'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    # Add the cascading FK as NOT VALID (no scan while the table is locked), then validate it
+    # below under a lock that keeps offer writable
+    op.drop_constraint('offer_product_id_fkey', 'offer', type_='foreignkey')
+    op.execute(
+        'ALTER TABLE offer ADD CONSTRAINT offer_product_id_fkey '
+        'FOREIGN KEY (product_id) REFERENCES product (id) ON DELETE CASCADE NOT VALID'
+    )
+    op.add_column('product', sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+
+    with op.get_context().autocommit_block():
+        op.execute('ALTER TABLE offer VALIDATE CONSTRAINT offer_product_id_fkey')
+        # The sync scan must skip soft-deleted products
+        op.drop_index('ix_product_registered', 'product', postgresql_concurrently=True)
+        op.create_index(
+            'ix_product_registered',
+            'product',
+            ['id', 'external_id', 'deleted_at'],
+            postgresql_where=sa.text('external_id IS NOT NULL AND deleted_at IS NULL'),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_product_deleted_at',
+            'product',
+            ['deleted_at'],
+            postgresql_where=sa.text('deleted_at IS NOT NULL'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_deleted_at', 'product')
+    op.drop_index('ix_product_registered', 'product')
+    op.create_index(
+        'ix_product_registered',
+        'product',
+        ['id', 'external_id'],
+        postgresql_where=sa.text('external_id IS NOT NULL'),
+    )
+    op.drop_column('product', 'deleted_at')
+    op.drop_constraint('offer_product_id_fkey', 'offer', type_='foreignkey')
+    op.create_foreign_key('offer_product_id_fkey', 'offer', 'product', ['product_id'], ['id'])
@@ -0,0 +1,56 @@
+"""add offer source
+
+Revision ID: d2f85b1c7a94
+Revises: b4d17e9a3c58
+Create Date: 2026-10-19 20:04:31.518263
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f85b1c7a94'
+down_revision: str | None = 'b4d17e9a3c58'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    # A constant default is stored in the catalog, so existing rows are not rewritten
+    op.add_column('offer', sa.Column('source', sa.String(64), server_default='primary', nullable=False))
+    op.add_column('offer_sync_state', sa.Column('source', sa.String(64), server_default='primary', nullable=False))
+    op.add_column('offer_sync_state', sa.Column('external_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.drop_constraint('offer_sync_state_pkey', 'offer_sync_state', type_='primary')
+    op.create_primary_key('offer_sync_state_pkey', 'offer_sync_state', ['product_id', 'source'])
+
+    # Reconcile reads source too; build the wider index beside the old one so reads stay index-only
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_offer_product_id_price_new',
+            'offer',
+            ['product_id', 'price'],
+            postgresql_include=['items_in_stock', 'id', 'source'],
+            postgresql_concurrently=True,
+        )
+        op.drop_index('ix_offer_product_id_price', 'offer', postgresql_concurrently=True)
+        op.execute('ALTER INDEX ix_offer_product_id_price_new RENAME TO ix_offer_product_id_price')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_offer_product_id_price', 'offer')
+    op.create_index(
+        'ix_offer_product_id_price',
+        'offer',
+        ['product_id', 'price'],
+        postgresql_include=['items_in_stock', 'id'],
+    )
+    op.execute("DELETE FROM offer_sync_state WHERE source <> 'primary'")
+    op.drop_constraint('offer_sync_state_pkey', 'offer_sync_state', type_='primary')
+    op.create_primary_key('offer_sync_state_pkey', 'offer_sync_state', ['product_id'])
+    op.drop_column('offer_sync_state', 'external_id')
+    op.drop_column('offer_sync_state', 'source')
+    op.drop_column('offer', 'source')
@@ -0,0 +1,54 @@
+"""add offer price range
+
+Revision ID: e7a3c9f05b12
+Revises: d2f85b1c7a94
+Create Date: 2026-10-19 22:15:08.370214
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a3c9f05b12'
+down_revision: str | None = 'd2f85b1c7a94'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'offer_price_range',
+        sa.Column('id', sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column(
+            'product_id',
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey('product.id', ondelete='CASCADE'),
+            nullable=False,
+        ),
+        sa.Column('recorded_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('min_price', sa.Integer(), nullable=True),
+        sa.Column('max_price', sa.Integer(), nullable=True),
+        sa.Column('changes', sa.Integer(), nullable=False),
+    )
+    op.create_index('ix_offer_price_range_product_recorded_at', 'offer_price_range', ['product_id', 'recorded_at'])
+
+    op.alter_column('offer_price_rollup', 'min_price', nullable=True)
+    op.alter_column('offer_price_rollup', 'max_price', nullable=True)
+    op.add_column('offer_price_rollup', sa.Column('close_min_price', sa.Integer(), nullable=True))
+    op.add_column('offer_price_rollup', sa.Column('close_max_price', sa.Integer(), nullable=True))
+    # Existing rollups only saw changed prices; their range is the best closing value available
+    op.execute('UPDATE offer_price_rollup SET close_min_price = min_price, close_max_price = max_price')
+
+
+def downgrade() -> None:
+    op.drop_column('offer_price_rollup', 'close_max_price')
+    op.drop_column('offer_price_rollup', 'close_min_price')
+    op.execute('DELETE FROM offer_price_rollup WHERE min_price IS NULL')
+    op.alter_column('offer_price_rollup', 'max_price', nullable=False)
+    op.alter_column('offer_price_rollup', 'min_price', nullable=False)
+    op.drop_index('ix_offer_price_range_product_recorded_at', 'offer_price_range')
+    op.drop_table('offer_price_range')
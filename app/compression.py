@@ -0,0 +1,134 @@
+"""Response compression (gzip, and brotli when installed)."""
+
+import gzip
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.http_cache import encoding_etag, if_none_match_candidates
+from app.negotiation import parse_qualities
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+_COMPRESSIBLE_TYPES = ("application/json", "application/msgpack", "text/")
+_UNCOMPRESSED_TYPES = ("text/event-stream",)
+# Above this size the fastest level is used, so compression time per response grows at the cheapest rate
+_LARGE_BODY = 1 << 20
+# Bodies this large take over a millisecond to compress; that runs in a worker thread instead of on the event loop
+_THREAD_MIN_SIZE = 64 * 1024
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    """Pick the content coding for a response: brotli if available and accepted, else gzip."""
+    codings = parse_qualities(accept_encoding)
+    wildcard = codings.get("*", 0.0)
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best = max(candidates, key=lambda c: codings.get(c, wildcard))
+    return best if codings.get(best, wildcard) > 0 else None
+
+
+def _compressible(headers: MutableHeaders) -> bool:
+    content_type = headers.get("content-type", "")
+    return (
+        "content-encoding" not in headers
+        and content_type.startswith(_COMPRESSIBLE_TYPES)
+        and not content_type.startswith(_UNCOMPRESSED_TYPES)
+    )
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing complete responses of at least `minimum_size` bytes.
+
+    Whether to compress is decided when the response starts: only responses with a
+    Content-Length are buffered and compressed. Streamed responses (SSE in particular)
+    have their headers and every chunk passed through immediately, so neither is held
+    back waiting for a body or a compressor buffer.
+
+    A compressed representation gets its own ETag (`"tag-gzip"`, `"tag-br"`), so it
+    never shares a strong validator with the identity body; `etag_matches` maps it back
+    to the product version when revalidating. Bodies of `_THREAD_MIN_SIZE` bytes or more
+    are compressed in a worker thread, so a large response does not stall the event loop.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 5, brotli_quality: int = 4) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        large = len(body) >= _LARGE_BODY
+        if encoding == "br":
+            return brotli.compress(body, quality=1 if large else self.brotli_quality)
+        return gzip.compress(body, compresslevel=1 if large else self.gzip_level, mtime=0)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = choose_encoding(request_headers.get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Message | None = None
+        chunks: list[bytes] = []
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if message["status"] == 304:
+                    _tag_revalidated(headers, request_headers.get("if-none-match", ""), encoding)
+                    await send(message)
+                    return
+                if not _compressible(headers):
+                    await send(message)
+                    return
+                headers.add_vary_header("Accept-Encoding")
+                length = headers.get("content-length")
+                if length is None or int(length) < self.minimum_size:
+                    await send(message)
+                    return
+                start_message = message  # complete body of known size follows; held until it is in
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            start, start_message = start_message, None
+            headers = MutableHeaders(scope=start)
+            body = b"".join(chunks)
+            if len(body) >= _THREAD_MIN_SIZE:
+                compressed = await anyio.to_thread.run_sync(self.compress, body, encoding)
+            else:
+                compressed = self.compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            if "etag" in headers:
+                headers["ETag"] = encoding_etag(headers["etag"], encoding)
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def _tag_revalidated(headers: MutableHeaders, if_none_match: str, encoding: str) -> None:
+    """Give a 304 the validator the client revalidated with, if that was the compressed one."""
+    etag = headers.get("etag")
+    if etag is None:
+        return
+    tagged = encoding_etag(etag, encoding)
+    if tagged.removeprefix("W/") in if_none_match_candidates(if_none_match):
+        headers["ETag"] = tagged
@@ -4,6 +4,7 @@ import logging
 import typing as t
 from contextlib import asynccontextmanager
 
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
@@ -12,6 +13,7 @@ from sqlalchemy.ext.asyncio import (
 )
 
 from app.config import settings
+from app.db.profiling import install_query_hooks
 
 log = logging.getLogger(__name__)
 
@@ -20,9 +22,25 @@ engine: AsyncEngine | None = None
 session_factory: async_sessionmaker[AsyncSession] | None = None
 
 
+def enable_sqlite_foreign_keys(engine: AsyncEngine) -> None:
+    """SQLite only enforces foreign keys (and ON DELETE CASCADE) when asked to, per connection."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_pragma(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
 def make_engine() -> AsyncEngine:
     """Create async database engine."""
-    return create_async_engine(settings.database_url)
+    eng = create_async_engine(settings.database_url)
+    enable_sqlite_foreign_keys(eng)
+    if settings.db_profiling:
+        install_query_hooks(eng)
+    return eng
 
 
 def make_session_factory(engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
@@ -64,7 +82,27 @@ async def db_session() -> t.AsyncIterator[AsyncSession]:
             raise
 
 
+@asynccontextmanager
+async def read_session() -> t.AsyncIterator[AsyncSession]:
+    """Acquire ORM session for reads only; closed without a COMMIT round-trip."""
+    if session_factory is None:
+        raise RuntimeError("Database not initialized")
+    async with session_factory() as session:
+        yield session
+
+
 async def get_session() -> t.AsyncIterator[AsyncSession]:
-    """FastAPI dependency that yields a database session."""
+    """FastAPI dependency that yields a database session, committed when the handler returns.
+
+    The session checks out a pool connection only at its first query. Declare it with
+    `Depends(get_session, scope="function")` so the connection goes back to the pool
+    before the response is serialized and sent.
+    """
     async with db_session() as session:
         yield session
+
+
+async def get_read_session() -> t.AsyncIterator[AsyncSession]:
+    """FastAPI dependency for read-only handlers: like `get_session`, minus the COMMIT round-trip."""
+    async with read_session() as session:
+        yield session
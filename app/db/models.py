@@ -1,9 +1,16 @@
 from datetime import UTC, datetime
 from uuid import UUID, uuid4
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, Text, Uuid
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Index, Integer, String, Text, Uuid, text
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
+from app.config import PRIMARY_SOURCE
+
+
+def as_utc(ts: datetime) -> datetime:
+    """SQLite hands back naive datetimes for timezone-aware columns, treat them as UTC."""
+    return ts if ts.tzinfo is not None else ts.replace(tzinfo=UTC)
+
 
 class Base(DeclarativeBase):
     """Base class for all SQLAlchemy ORM models."""
@@ -13,26 +20,70 @@ class Base(DeclarativeBase):
 
 class Product(Base):
     __tablename__ = "product"
+    __table_args__ = (
+        # Serves the sync scan of registered, live products in id order, without a sort
+        Index(
+            "ix_product_registered",
+            "id",
+            "external_id",
+            postgresql_where=text("external_id IS NOT NULL AND deleted_at IS NULL"),
+            sqlite_where=text("external_id IS NOT NULL AND deleted_at IS NULL"),
+        ),
+        # Lets the purge job find soft-deleted products without scanning live ones
+        Index(
+            "ix_product_deleted_at",
+            "deleted_at",
+            postgresql_where=text("deleted_at IS NOT NULL"),
+            sqlite_where=text("deleted_at IS NOT NULL"),
+        ),
+    )
 
     id: Mapped[UUID] = mapped_column(Uuid, primary_key=True, default=uuid4)
     name: Mapped[str] = mapped_column(String, nullable=False)
     description: Mapped[str | None] = mapped_column(Text)
     external_id: Mapped[UUID | None] = mapped_column(Uuid, index=True)  # ID from offers service
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")  # ETag source
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(UTC))
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=lambda: datetime.now(UTC), onupdate=lambda: datetime.now(UTC)
     )
+    deleted_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))  # set by soft delete, purged later
 
-    offers: Mapped[list["Offer"]] = relationship(back_populates="product", cascade="all, delete-orphan")
+    # Offers are removed by the database (ON DELETE CASCADE), never loaded just to be deleted
+    offers: Mapped[list["Offer"]] = relationship(
+        back_populates="product", cascade="all, delete-orphan", passive_deletes=True
+    )
 
 
 class Offer(Base):
     __tablename__ = "offer"
+    __table_args__ = (
+        # Per-product reads ordered by price; INCLUDE makes reconcile and the offers endpoint index-only
+        Index(
+            "ix_offer_product_id_price",
+            "product_id",
+            "price",
+            postgresql_include=["items_in_stock", "id", "source"],
+        ),
+        # In-stock reads select id and stock too; INCLUDE keeps them index-only
+        Index(
+            "ix_offer_in_stock",
+            "product_id",
+            "price",
+            postgresql_include=["id", "items_in_stock"],
+            postgresql_where=text("items_in_stock > 0"),
+            sqlite_where=text("items_in_stock > 0"),
+        ),
+    )
 
     id: Mapped[UUID] = mapped_column(Uuid, primary_key=True)
-    product_id: Mapped[UUID] = mapped_column(Uuid, ForeignKey("product.id"), nullable=False, index=True)
+    product_id: Mapped[UUID] = mapped_column(Uuid, ForeignKey("product.id", ondelete="CASCADE"), nullable=False)
     price: Mapped[int] = mapped_column(Integer, nullable=False)
     items_in_stock: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Provider that reported the offer; each source reconciles only its own rows
+    source: Mapped[str] = mapped_column(
+        String(64), nullable=False, default=PRIMARY_SOURCE, server_default=PRIMARY_SOURCE
+    )
     last_seen_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(UTC))
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(UTC))
     updated_at: Mapped[datetime] = mapped_column(
@@ -40,3 +91,103 @@ class Offer(Base):
     )
 
     product: Mapped["Product"] = relationship(back_populates="offers")
+
+
+class OfferSyncState(Base):
+    """Upstream validators from the last offers fetch per provider, used for conditional requests."""
+
+    __tablename__ = "offer_sync_state"
+
+    product_id: Mapped[UUID] = mapped_column(Uuid, ForeignKey("product.id", ondelete="CASCADE"), primary_key=True)
+    source: Mapped[str] = mapped_column(
+        String(64), primary_key=True, default=PRIMARY_SOURCE, server_default=PRIMARY_SOURCE
+    )
+    external_id: Mapped[UUID | None] = mapped_column(Uuid)  # ID at this provider; the main service's is product's
+    etag: Mapped[str | None] = mapped_column(String)
+    last_modified: Mapped[str | None] = mapped_column(String)
+    content_length: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # size of the last full body
+    synced_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))  # last successful fetch
+
+
+class OfferHistory(Base):
+    """Append-only log of offer price/stock changes."""
+
+    __tablename__ = "offer_history"
+    __table_args__ = (
+        Index("ix_offer_history_product_recorded_at", "product_id", "recorded_at"),
+        # Rows arrive in time order, so a BRIN index keeps time-range scans cheap at a fraction of a btree's size
+        Index("ix_offer_history_recorded_at", "recorded_at", postgresql_using="brin"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    product_id: Mapped[UUID] = mapped_column(Uuid, ForeignKey("product.id", ondelete="CASCADE"), nullable=False)
+    offer_id: Mapped[UUID] = mapped_column(Uuid, nullable=False)
+    price: Mapped[int] = mapped_column(Integer, nullable=False)
+    items_in_stock: Mapped[int] = mapped_column(Integer, nullable=False)
+    recorded_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(UTC))
+
+
+class OfferPriceRange(Base):
+    """Price range of all of a product's live offers after each batch of changes.
+
+    The range holds until the next row, so a series can carry it across periods without changes.
+    NULL min/max means the product had no offers.
+    """
+
+    __tablename__ = "offer_price_range"
+    __table_args__ = (Index("ix_offer_price_range_product_recorded_at", "product_id", "recorded_at"),)
+
+    id: Mapped[int] = mapped_column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    product_id: Mapped[UUID] = mapped_column(Uuid, ForeignKey("product.id", ondelete="CASCADE"), nullable=False)
+    recorded_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    min_price: Mapped[int | None] = mapped_column(Integer)
+    max_price: Mapped[int | None] = mapped_column(Integer)
+    changes: Mapped[int] = mapped_column(Integer, nullable=False)  # offer changes in the batch
+
+
+class OfferPriceRollup(Base):
+    """Hourly min/max of a product's live offer prices, for long-range series."""
+
+    __tablename__ = "offer_price_rollup"
+
+    product_id: Mapped[UUID] = mapped_column(Uuid, ForeignKey("product.id", ondelete="CASCADE"), primary_key=True)
+    bucket_start: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    min_price: Mapped[int | None] = mapped_column(Integer)  # includes the range carried in from the previous hour
+    max_price: Mapped[int | None] = mapped_column(Integer)
+    close_min_price: Mapped[int | None] = mapped_column(Integer)  # range in effect at the end of the hour
+    close_max_price: Mapped[int | None] = mapped_column(Integer)
+    samples: Mapped[int] = mapped_column(Integer, nullable=False)  # offer changes in the hour
+
+
+class OfferChange(Base):
+    """Committed offer change events, tailed by every process to share them across processes.
+
+    No foreign key to product: rows are short-lived and pruned by age, and removals must
+    still be readable after the product is gone.
+    """
+
+    __tablename__ = "offer_change"
+    __table_args__ = (Index("ix_offer_change_created_at", "created_at"),)
+
+    id: Mapped[int] = mapped_column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    product_id: Mapped[UUID] = mapped_column(Uuid, nullable=False)
+    offer_id: Mapped[UUID] = mapped_column(Uuid, nullable=False)
+    kind: Mapped[str] = mapped_column(String(16), nullable=False)
+    old_price: Mapped[int | None] = mapped_column(Integer)
+    new_price: Mapped[int | None] = mapped_column(Integer)
+    old_stock: Mapped[int | None] = mapped_column(Integer)
+    new_stock: Mapped[int | None] = mapped_column(Integer)
+    origin: Mapped[UUID] = mapped_column(Uuid, nullable=False)  # process that wrote the row and already published it
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(UTC))
+
+
+class SyncCheckpoint(Base):
+    """Progress of the latest scheduled sync run, so a restarted process resumes instead of starting over."""
+
+    __tablename__ = "sync_checkpoint"
+
+    job: Mapped[str] = mapped_column(String(64), primary_key=True)
+    run_id: Mapped[UUID] = mapped_column(Uuid, nullable=False)
+    started_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    last_product_id: Mapped[UUID | None] = mapped_column(Uuid)  # products are synced in id order
+    completed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))  # NULL while a run is unfinished
@@ -0,0 +1,166 @@
+"""Request-scoped query profiling, slow-query log and N+1 detection."""
+
+import logging
+import time
+import typing as t
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, ExecutionContext
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+log = logging.getLogger(__name__)
+slow_log = logging.getLogger("app.db.slow_queries")
+
+_EXPLAIN_PREFIX = {"postgresql": "EXPLAIN ", "sqlite": "EXPLAIN QUERY PLAN "}
+_SLOWEST_KEPT = 3
+_EXPLAIN_SAVEPOINT = "slow_query_explain"
+
+_current: ContextVar["QueryProfile | None"] = ContextVar("query_profile", default=None)
+
+
+@dataclass
+class QueryProfile:
+    """Statements executed within one request (or `profile_queries()` block)."""
+
+    statements: int = 0
+    db_time: float = 0.0
+    slowest: list[tuple[float, str]] = field(default_factory=list)
+    counts: Counter[str] = field(default_factory=Counter)
+    repeated: set[str] = field(default_factory=set)  # statements flagged as likely N+1
+
+    def record(self, statement: str, duration: float) -> None:
+        self.statements += 1
+        self.db_time += duration
+
+        self.slowest.append((duration, statement))
+        self.slowest.sort(key=lambda item: item[0], reverse=True)
+        del self.slowest[_SLOWEST_KEPT:]
+
+        if not statement.lstrip().upper().startswith("SELECT"):
+            return
+        self.counts[statement] += 1
+        if self.counts[statement] == settings.n_plus_one_threshold:
+            self.repeated.add(statement)
+            log.warning(
+                "Possible N+1 query: statement executed %d times in one request: %s",
+                settings.n_plus_one_threshold,
+                _shorten(statement),
+            )
+
+    def server_timing(self) -> str:
+        """Render as a Server-Timing header value."""
+        parts = [f'db;dur={self.db_time * 1000:.2f};desc="{self.statements} statements"']
+        if self.slowest:
+            parts.append(f"db-slowest;dur={self.slowest[0][0] * 1000:.2f}")
+        if self.repeated:
+            parts.append(f'db-n-plus-one;desc="{len(self.repeated)} repeated statements"')
+        return ", ".join(parts)
+
+
+def _shorten(statement: str, limit: int = 300) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + "..."
+
+
+def _explain(conn: Connection, statement: str, parameters: t.Any) -> str | None:
+    """Capture the plan of a SELECT on a separate cursor of the same connection.
+
+    The EXPLAIN runs inside a savepoint of the request's transaction: on Postgres a failed
+    statement would otherwise abort the whole transaction.
+    """
+    prefix = _EXPLAIN_PREFIX.get(conn.dialect.name)
+    if prefix is None or not statement.lstrip().upper().startswith("SELECT"):
+        return None
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(f"SAVEPOINT {_EXPLAIN_SAVEPOINT}")
+        try:
+            cursor.execute(prefix + statement, parameters)
+            plan = "\n".join(" ".join(str(col) for col in row) for row in cursor.fetchall())
+        except Exception:
+            cursor.execute(f"ROLLBACK TO SAVEPOINT {_EXPLAIN_SAVEPOINT}")
+            raise
+        finally:
+            cursor.execute(f"RELEASE SAVEPOINT {_EXPLAIN_SAVEPOINT}")
+        return plan
+    except Exception as e:
+        log.warning("EXPLAIN failed: %s", e)
+        return None
+    finally:
+        cursor.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context: ExecutionContext, executemany) -> None:
+    context._query_start = time.perf_counter()  # type: ignore[attr-defined]
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context: ExecutionContext, executemany) -> None:
+    duration = time.perf_counter() - context._query_start  # type: ignore[attr-defined]
+
+    profile = _current.get()
+    if profile is not None:
+        profile.record(statement, duration)
+
+    if duration * 1000 >= settings.slow_query_ms:
+        plan = None if executemany else _explain(conn, statement, parameters)
+        slow_log.warning(
+            "Slow query (%.1f ms): %s",
+            duration * 1000,
+            _shorten(statement),
+            extra={"duration_ms": round(duration * 1000, 2), "plan": plan},
+        )
+
+
+def install_query_hooks(engine: AsyncEngine) -> None:
+    """Attach timing hooks to an engine's underlying sync engine."""
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def profile_queries() -> t.Iterator[QueryProfile]:
+    """Collect statements executed in the current context."""
+    profile = QueryProfile()
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+
+
+class QueryProfilerMiddleware:
+    """ASGI middleware reporting per-request DB statement count and time via Server-Timing."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with profile_queries() as profile:
+
+            async def send_with_timing(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    MutableHeaders(scope=message).append("Server-Timing", profile.server_timing())
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
+
+        log.debug(
+            "%s %s: %d statements, %.2f ms in DB",
+            scope["method"],
+            scope["path"],
+            profile.statements,
+            profile.db_time * 1000,
+            extra={"slowest": [(round(d * 1000, 2), _shorten(s, 120)) for d, s in profile.slowest]},
+        )
@@ -0,0 +1,66 @@
+"""Conditional GET helpers (ETag / If-None-Match)."""
+
+from uuid import UUID
+
+from fastapi import Request, Response
+
+from app.config import settings
+
+# Appended by CompressionMiddleware to the ETag of a compressed representation
+_ENCODING_SUFFIXES = ("-gzip", "-br")
+
+
+def make_etag(product_id: UUID, version: int, variant: str = "") -> str:
+    """Build a strong ETag from a product's version counter.
+
+    `variant` distinguishes different representations of the same product
+    (e.g. filtered offer lists) so they never share a validator.
+    """
+    tag = f"{product_id.hex}-{version}"
+    if variant:
+        tag = f"{tag}-{variant}"
+    return f'"{tag}"'
+
+
+def encoding_etag(etag: str, encoding: str) -> str:
+    """The ETag of `etag`'s representation in a content coding: `"tag"` becomes `"tag-gzip"`."""
+    return f'{etag[:-1]}-{encoding}"' if etag.endswith('"') else etag
+
+
+def _without_encoding(etag: str) -> str:
+    for suffix in _ENCODING_SUFFIXES:
+        if etag.endswith(f'{suffix}"'):
+            return f'{etag[: -len(suffix) - 1]}"'
+    return etag
+
+
+def if_none_match_candidates(header: str) -> list[str]:
+    """Opaque tags of an If-None-Match header, weakness indicators dropped."""
+    return [c.strip().removeprefix("W/") for c in header.split(",")]
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check the request's If-None-Match header against `etag` (weak comparison).
+
+    A validator of a compressed representation matches the ETag it was derived from,
+    since it names the same product version.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (_without_encoding(c) for c in if_none_match_candidates(header))
+
+
+def set_cache_headers(response: Response, etag: str) -> None:
+    """Attach validator and caching policy headers."""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = f"private, max-age={settings.http_cache_max_age}, must-revalidate"
+
+
+def not_modified(etag: str) -> Response:
+    """Build an empty 304 response carrying the current validator."""
+    response = Response(status_code=304)
+    set_cache_headers(response, etag)
+    return response
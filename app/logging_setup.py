@@ -1,25 +1,125 @@
 """Logging configuration."""
 
+import atexit
+import json
 import logging
+import queue
+from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener
 
 from app.config import settings
 
+# Attributes every LogRecord has; anything else was passed via `extra=`
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener: QueueListener | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Render records as single-line JSON objects, including `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, UTC).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep 1 in N INFO/DEBUG records for configured loggers; WARNING and above always pass.
+
+    `rates` maps logger name prefixes to the fraction of records to keep, the longest
+    matching prefix wins. Sampling is counter based, so it is deterministic and cheap.
+    """
+
+    def __init__(self, rates: dict[str, float]) -> None:
+        super().__init__()
+        self.intervals = {
+            name: max(1, round(1 / rate)) if rate > 0 else 0 for name, rate in rates.items()
+        }
+        self._prefixes = sorted(self.intervals, key=len, reverse=True)
+        self._counters: dict[str, int] = {}
+
+    def _interval_for(self, logger_name: str) -> int | None:
+        for prefix in self._prefixes:
+            if logger_name == prefix or logger_name.startswith(prefix + "."):
+                return self.intervals[prefix]
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        interval = self._interval_for(record.name)
+        if interval is None:
+            return True
+        if interval == 0:
+            return False
+        count = self._counters.get(record.name, 0)
+        self._counters[record.name] = count + 1
+        return count % interval == 0
+
+
+def _stop_listener() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Enqueue records untouched so message formatting runs on the listener thread.
+
+    The stock QueueHandler formats in the caller to make records picklable, which
+    is unnecessary for an in-process queue and puts the cost back on the hot path.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
 
 def init_logging() -> None:
     """Initialize logging configuration.
 
     Log level can be configured via LOG_LEVEL environment variable.
     Valid values: DEBUG, INFO, WARNING, ERROR, CRITICAL (default: INFO)
+    LOG_FORMAT selects `text` (default) or `json` output, LOG_SAMPLE_RATES maps
+    logger names to the fraction of INFO/DEBUG records to keep.
+    Records are handed to a background thread through a queue, so emitting a log
+    line never blocks on stream I/O.
     """
-    log_format = logging.Formatter(
-        fmt="{asctime} | {levelname} | {name} | {message}",
-        datefmt="%Y-%m-%d %H:%M:%S",
-        style="{",
-    )
+    global _listener
+
+    if settings.log_format == "json":
+        log_format: logging.Formatter = JsonFormatter()
+    else:
+        log_format = logging.Formatter(
+            fmt="{asctime} | {levelname} | {name} | {message}",
+            datefmt="%Y-%m-%d %H:%M:%S",
+            style="{",
+        )
 
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(log_format)
 
+    _stop_listener()
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, console_handler)
+    _listener.start()
+    atexit.register(_stop_listener)  # idempotent, repeated registration is harmless
+
+    queue_handler = DeferredQueueHandler(log_queue)
+    if settings.log_sample_rates:
+        queue_handler.addFilter(SamplingFilter(settings.log_sample_rates))
+
     log_level = getattr(logging, settings.log_level.upper(), logging.INFO)
 
-    logging.basicConfig(level=log_level, handlers=[console_handler], force=True)
+    logging.basicConfig(level=log_level, handlers=[queue_handler], force=True)
@@ -2,16 +2,23 @@
 
 import logging
 from contextlib import asynccontextmanager
+from dataclasses import asdict
 
 from fastapi import FastAPI
 from fastapi.responses import JSONResponse
 from sqlalchemy import text
 
+from app.compression import CompressionMiddleware
+from app.config import settings
 from app.db import database
-from app.db.database import db_session, manage_db_engine
+from app.db.database import db_session, manage_db_engine, read_session
+from app.db.profiling import QueryProfilerMiddleware
 from app.logging_setup import init_logging
-from app.routers import offers, products
-from app.services.offers_client import OffersClient
+from app.routers import offers, products, stream
+from app.services.change_feed import listener as change_feed
+from app.services.providers import close_providers, provider_stats
+from app.services.snapshot import snapshot
+from app.tasks import scheduler
 from app.tasks.scheduler import start_scheduler, stop_scheduler
 
 init_logging()
@@ -23,16 +30,48 @@ async def lifespan(app: FastAPI):
     """Manage the application lifecycle."""
     async with manage_db_engine() as engine:
         database.engine = engine
+        if settings.offer_snapshot:
+            # Loaded before the scheduler starts, so no sync can slip in between load and first update
+            async with read_session() as session:
+                await snapshot.load(session)
+        if settings.change_feed:
+            await change_feed.start()
         start_scheduler()
         yield
-        stop_scheduler()
-        await OffersClient.close()
+        await stop_scheduler()
+        await change_feed.stop()
+        await close_providers()
 
 
 app = FastAPI(title="Product Aggregator", lifespan=lifespan)
 
+if settings.db_profiling:
+    app.add_middleware(QueryProfilerMiddleware)
+if settings.compression:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_min_size,
+        gzip_level=settings.gzip_level,
+        brotli_quality=settings.brotli_quality,
+    )
+
 app.include_router(products.router)
 app.include_router(offers.router)
+app.include_router(stream.router)
+
+
+@app.get("/metrics")
+async def metrics():
+    """In-process counters: last sync cycle, per-provider fetches and request coalescing."""
+    return {
+        "last_sync": asdict(scheduler.last_sync_stats) if scheduler.last_sync_stats else None,
+        "providers": provider_stats(),
+        "singleflight": {
+            "offers_version": offers.version_flight.stats(),
+            "offers": offers.offers_flight.stats(),
+        },
+        "offer_snapshot": snapshot.stats() if snapshot.ready else None,
+    }
 
 
 @app.get("/health")
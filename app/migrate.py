@@ -0,0 +1,116 @@
+"""Apply pending migrations, skipping Alembic entirely when the database is already at head.
+
+Loading Alembic and `alembic/env.py` (which imports all models) costs far more than
+the check itself, and on almost every start there is nothing to do. The heads are
+read straight from the revision files and compared with `alembic_version`; only a
+database that is behind goes through `alembic upgrade head`.
+
+Usage:
+    python -m app.migrate [--config alembic.ini]
+"""
+
+import argparse
+import ast
+import asyncio
+import configparser
+import logging
+import time
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.config import settings
+
+log = logging.getLogger(__name__)
+
+
+def _literal_assignments(path: Path, names: set[str]) -> dict[str, object]:
+    """Module-level `name = <literal>` / `name: type = <literal>` values from a source file."""
+    values = {}
+    for node in ast.parse(path.read_text()).body:
+        targets: list[ast.expr]
+        if isinstance(node, ast.AnnAssign) and node.value is not None:
+            targets, value = [node.target], node.value
+        elif isinstance(node, ast.Assign):
+            targets, value = node.targets, node.value
+        else:
+            continue
+        for target in targets:
+            if isinstance(target, ast.Name) and target.id in names:
+                values[target.id] = ast.literal_eval(value)
+    return values
+
+
+def script_heads(versions_dir: Path) -> set[str]:
+    """Head revisions of the migration scripts, without importing them."""
+    revisions: set[str] = set()
+    parents: set[str] = set()
+    for path in versions_dir.glob("*.py"):
+        values = _literal_assignments(path, {"revision", "down_revision"})
+        if "revision" not in values:
+            continue
+        revisions.add(values["revision"])  # type: ignore[arg-type]
+        down = values.get("down_revision")
+        if isinstance(down, str):
+            parents.add(down)
+        elif down:
+            parents.update(down)  # type: ignore[arg-type]
+    return revisions - parents
+
+
+async def database_revisions(database_url: str) -> set[str]:
+    """Revisions recorded in `alembic_version`; empty if the table does not exist yet."""
+    engine = create_async_engine(database_url, poolclass=NullPool)
+    try:
+        async with engine.connect() as conn:
+            try:
+                result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+            except DBAPIError:
+                return set()
+            return set(result.scalars())
+    finally:
+        await engine.dispose()
+
+
+def versions_dir(config_path: str) -> Path:
+    """The `versions/` directory of the script location configured in alembic.ini."""
+    parser = configparser.ConfigParser()
+    if not parser.read(config_path):
+        raise FileNotFoundError(config_path)
+    script_location = Path(parser.get("alembic", "script_location"))
+    if not script_location.is_absolute():
+        script_location = Path(config_path).resolve().parent / script_location
+    return script_location / "versions"
+
+
+def migrate(config_path: str = "alembic.ini") -> bool:
+    """Upgrade the database to head if needed. Returns whether Alembic ran."""
+    heads = script_heads(versions_dir(config_path))
+    current = asyncio.run(database_revisions(settings.database_url))
+    if current == heads:
+        log.info("Database is at head (%s), skipping migrations", ", ".join(sorted(heads)))
+        return False
+
+    log.info("Database at %s, upgrading to %s", ", ".join(sorted(current)) or "<empty>", ", ".join(sorted(heads)))
+    from alembic import command, config
+
+    command.upgrade(config.Config(config_path), "head")
+    return True
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="alembic.ini", help="path to alembic.ini")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)-5.5s [%(name)s] %(message)s")
+    start = time.perf_counter()
+    migrate(args.config)
+    log.info("Migration check finished in %.0f ms", (time.perf_counter() - start) * 1000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Content negotiation for list endpoints: JSON (default) or MessagePack."""
+
+import typing as t
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def parse_qualities(header: str) -> dict[str, float]:
+    """Parse an Accept / Accept-Encoding style header into {value: q}."""
+    qualities = {}
+    for item in header.split(","):
+        value, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, raw = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(raw)
+                except ValueError:
+                    q = 0.0
+        if value:
+            qualities[value.strip().lower()] = q
+    return qualities
+
+
+def wants_msgpack(request: Request) -> bool:
+    """True if MessagePack is installed and the client prefers it at least as much as JSON."""
+    if msgpack is None:
+        return False
+    qualities = parse_qualities(request.headers.get("accept", ""))
+    msgpack_q = max(qualities.get(media_type, 0.0) for media_type in MSGPACK_MEDIA_TYPES)
+    return msgpack_q > 0 and msgpack_q >= qualities.get("application/json", 0.0)
+
+
+class MsgPackResponse(Response):
+    media_type = "application/msgpack"
+
+    def render(self, content: t.Any) -> bytes:
+        return msgpack.packb(content)
+
+
+def msgpack_response(adapter: TypeAdapter, content: t.Any, response: Response) -> MsgPackResponse:
+    """Serialize `content` through `adapter` like a `response_model` would, then encode it as MessagePack.
+
+    Headers already set on the injected `response` (ETag, Cache-Control, ...) are carried over.
+    """
+    data = adapter.dump_python(adapter.validate_python(content, from_attributes=True), mode="json")
+    return MsgPackResponse(data, headers=dict(response.headers))
+
+
+def set_vary_accept(response: Response) -> None:
+    """Mark a negotiated response so shared caches key it on the Accept header."""
+    vary = response.headers.get("Vary")
+    response.headers["Vary"] = f"{vary}, Accept" if vary else "Accept"
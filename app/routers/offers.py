@@ -1,45 +1,226 @@
-"""Offers read-only endpoints."""
+"""Offers endpoints: cached reads and on-demand sync."""
 
+import asyncio
 import logging
+from datetime import UTC, datetime, timedelta
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy import Row, Select, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_session
-from app.db.models import Offer as OfferModel, Product as ProductModel
-from app.schemas import Offer
+from app.config import settings
+from app.db.database import get_read_session, read_session
+from app.db.models import Offer as OfferModel, OfferSyncState, Product as ProductModel, as_utc
+from app.http_cache import etag_matches, make_etag, not_modified, set_cache_headers
+from app.negotiation import msgpack_response, set_vary_accept, wants_msgpack
+from app.schemas import Offer, PricePoint, SyncStatus
+from app.services.price_history import price_series
+from app.services.providers import offer_providers
+from app.services.singleflight import SingleFlight
+from app.services.snapshot import snapshot
+from app.services.sync_service import SyncStats, start_product_sync
 
 log = logging.getLogger(__name__)
 router = APIRouter(prefix="/products", tags=["offers"])
 
+offers_adapter = TypeAdapter(list[Offer])
 
-@router.get("/{product_id}/offers", response_model=list[Offer])
-async def get_product_offers(product_id: UUID, session: AsyncSession = Depends(get_session)):
-    """Get cached offers for a product."""
-    log.info("Fetching offers for product: id=%s", product_id)
 
-    product = await session.get(ProductModel, product_id)
-    if not product:
+def offers_query(product_id: UUID, in_stock: bool = False) -> Select:
+    """Offer columns ordered by price, index-only on ix_offer_product_id_price / ix_offer_in_stock."""
+    query = select(OfferModel.id, OfferModel.product_id, OfferModel.price, OfferModel.items_in_stock).where(
+        OfferModel.product_id == product_id
+    )
+    if in_stock:
+        query = query.where(OfferModel.items_in_stock > 0)
+    return query.order_by(OfferModel.price)
+
+
+# Concurrent requests for the same product share one query instead of each running their own
+version_flight: SingleFlight[UUID, Row | None] = SingleFlight()
+offers_flight: SingleFlight[tuple[UUID, int, bool], list[Row]] = SingleFlight()
+
+
+async def _load_freshness(product_id: UUID) -> Row | None:
+    """Product version, external id and last sync time in one round-trip; None if missing or soft-deleted.
+
+    The sync time is the latest of any provider: one that keeps failing should not
+    make every `max_age` request wait on a sync.
+    """
+    synced_at = (
+        select(func.max(OfferSyncState.synced_at))
+        .where(OfferSyncState.product_id == ProductModel.id)
+        .scalar_subquery()
+    )
+    async with read_session() as session:
+        result = await session.execute(
+            select(ProductModel.version, ProductModel.external_id, synced_at.label("synced_at")).where(
+                ProductModel.id == product_id, ProductModel.deleted_at.is_(None)
+            )
+        )
+        return result.first()
+
+
+async def _load_offers(product_id: UUID, in_stock: bool) -> list[Row]:
+    async with read_session() as session:
+        result = await session.execute(offers_query(product_id, in_stock))
+        return list(result.all())
+
+
+def _is_stale(synced_at: datetime | None, max_age: float) -> bool:
+    return synced_at is None or datetime.now(UTC) - as_utc(synced_at) > timedelta(seconds=max_age)
+
+
+async def _await_sync(sync: "asyncio.Future[SyncStats]") -> SyncStats | None:
+    """Wait up to the on-demand timeout; the sync keeps running in the background if it takes longer."""
+    try:
+        return await asyncio.wait_for(asyncio.shield(sync), settings.on_demand_sync_timeout)
+    except TimeoutError:
+        return None
+
+
+@router.get(
+    "/{product_id}/offers",
+    response_model=list[Offer],
+    responses={200: {"content": {"application/msgpack": {}}}, 304: {"description": "Not Modified"}},
+)
+async def get_product_offers(
+    product_id: UUID,
+    request: Request,
+    response: Response,
+    in_stock: bool = False,
+    max_age: float | None = Query(None, ge=0, description="Refresh from upstream if data is older (seconds)"),
+):
+    """Get cached offers for a product, cheapest first (MessagePack with `Accept: application/msgpack`)."""
+    # Only the version is needed to answer a revalidation, offer rows are loaded on a miss
+    freshness = await version_flight.do(product_id, lambda: _load_freshness(product_id))
+    if freshness is None:
         log.warning("Product not found for offers request: id=%s", product_id)
         raise HTTPException(status_code=404, detail="Product not found")
 
-    log.debug("Product found: name=%s, external_id=%s", product.name, product.external_id)
+    if max_age is not None and freshness.external_id is not None and _is_stale(freshness.synced_at, max_age):
+        sync = start_product_sync(offer_providers(), product_id, freshness.external_id)
+        try:
+            refreshed = await _await_sync(sync)
+        except Exception:
+            log.warning("On-demand sync failed for product %s, serving cached offers", product_id, exc_info=True)
+        else:
+            if refreshed is None:
+                log.info("On-demand sync for product %s timed out, serving cached offers", product_id)
+            else:
+                # Read directly: a shared lookup started before the sync would miss its changes
+                freshness = await _load_freshness(product_id) or freshness
 
-    result = await session.execute(
-        select(OfferModel).where(OfferModel.product_id == product_id)
-    )
-    offers = result.scalars().all()
-
-    in_stock_count = sum(1 for o in offers if o.items_in_stock > 0)
-    log.info(
-        "Retrieved %d offers for product %s (name=%s): %d in stock, %d out of stock",
-        len(offers),
-        product_id,
-        product.name,
-        in_stock_count,
-        len(offers) - in_stock_count,
-    )
+    version = freshness.version
+    msgpack = wants_msgpack(request)
+
+    variant = "offers-in-stock" if in_stock else "offers"
+    etag = make_etag(product_id, version, f"{variant}-msgpack" if msgpack else variant)
+    if etag_matches(request, etag):
+        log.debug("Offers not modified for product %s (version=%d)", product_id, version)
+        return not_modified(etag)
+
+    # Keyed by version so requests arriving after an invalidation never join a stale load
+    offers = await offers_flight.do((product_id, version, in_stock), lambda: _load_offers(product_id, in_stock))
+
+    log.info("Retrieved %d offers for product %s", len(offers), product_id)
 
+    set_cache_headers(response, etag)
+    set_vary_accept(response)
+    if freshness.synced_at is not None:
+        response.headers["X-Offers-Synced-At"] = as_utc(freshness.synced_at).isoformat()
+    if msgpack:
+        return msgpack_response(offers_adapter, offers, response)
     return offers
+
+
+def live_product_query(product_id: UUID) -> Select:
+    return select(ProductModel.id).where(ProductModel.id == product_id, ProductModel.deleted_at.is_(None))
+
+
+@router.get("/{product_id}/offers/best", response_model=Offer)
+async def get_best_offer(product_id: UUID):
+    """Get the cheapest in-stock offer, from the in-memory snapshot when enabled."""
+    if await snapshot.revalidate(product_id):
+        best = snapshot.best_offer(product_id)
+        if best is None:
+            raise HTTPException(status_code=404, detail="No offer in stock")
+        offer_id, price, stock = best
+        return Offer(id=offer_id, product_id=product_id, price=price, items_in_stock=stock)
+
+    async with read_session() as session:
+        if await session.scalar(live_product_query(product_id)) is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        best_row = (await session.execute(offers_query(product_id, in_stock=True).limit(1))).first()
+    if best_row is None:
+        raise HTTPException(status_code=404, detail="No offer in stock")
+    return best_row
+
+
+@router.get("/{product_id}/offers/in-stock", response_model=list[UUID])
+async def get_in_stock_offer_ids(product_id: UUID):
+    """Get ids of offers with stock, cheapest first, from the in-memory snapshot when enabled."""
+    if await snapshot.revalidate(product_id):
+        return snapshot.in_stock_ids(product_id)
+
+    async with read_session() as session:
+        if await session.scalar(live_product_query(product_id)) is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return list(await session.scalars(offers_query(product_id, in_stock=True).with_only_columns(OfferModel.id)))
+
+
+@router.post("/{product_id}/offers/sync", response_model=SyncStatus, responses={202: {"model": SyncStatus}})
+async def sync_product_offers(product_id: UUID, response: Response, wait: bool = True):
+    """Sync a product's offers from upstream now, joining a sync already in flight.
+
+    With `wait` the call returns once the sync finishes (bounded by the on-demand
+    timeout, after which it answers 202 and the sync carries on in the background).
+    """
+    freshness = await _load_freshness(product_id)
+    if freshness is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    if freshness.external_id is None:
+        raise HTTPException(status_code=409, detail="Product is not registered with the offers service")
+
+    sync = start_product_sync(offer_providers(), product_id, freshness.external_id)
+    stats = None
+    if wait:
+        try:
+            stats = await _await_sync(sync)
+        except Exception as e:
+            log.warning("On-demand sync failed for product %s: %s", product_id, e)
+            raise HTTPException(status_code=502, detail="Upstream sync failed") from e
+
+    if stats is None:
+        response.status_code = 202
+        return SyncStatus(status="pending")
+    return SyncStatus(status="synced", not_modified=bool(stats.not_modified), offer_changes=stats.offer_changes)
+
+
+@router.get("/{product_id}/offers/history", response_model=list[PricePoint])
+async def get_product_price_history(
+    product_id: UUID,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    points: int = Query(100, ge=1, le=1000),
+    session: AsyncSession = Depends(get_read_session, scope="function"),
+):
+    """Get a downsampled min/max price series for a product (default: last 24 hours)."""
+    end = end or datetime.now(UTC)
+    start = start or end - timedelta(days=1)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=UTC)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=UTC)
+    if start >= end:
+        raise HTTPException(status_code=422, detail="start must be before end")
+
+    exists = await session.scalar(live_product_query(product_id))
+    if exists is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    series = await price_series(session, product_id, start, end, points)
+    log.debug("Price history for product %s: %d points", product_id, len(series))
+    return series
@@ -1,88 +1,138 @@
 """Product CRUD endpoints."""
 
 import logging
-from uuid import UUID
+from datetime import UTC, datetime
+from uuid import UUID, uuid4
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy import Delete, Update, delete, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_session
+from app.config import settings
+from app.db.database import get_read_session, get_session
 from app.db.models import Product as ProductModel
+from app.http_cache import etag_matches, make_etag, not_modified, set_cache_headers
+from app.negotiation import msgpack_response, set_vary_accept, wants_msgpack
 from app.schemas import Product, ProductCreate, ProductUpdate
 from app.services.offers_client import OffersClient
+from app.services.snapshot import snapshot
 
 log = logging.getLogger(__name__)
 router = APIRouter(prefix="/products", tags=["products"])
 
+products_adapter = TypeAdapter(list[Product])
+
+
+async def _get_live_product(session: AsyncSession, product_id: UUID) -> ProductModel | None:
+    """Load a product unless it is missing or soft-deleted."""
+    product = await session.get(ProductModel, product_id)
+    return product if product is not None and product.deleted_at is None else None
+
 
 @router.post("", response_model=Product, status_code=201)
-async def create_product(data: ProductCreate, session: AsyncSession = Depends(get_session)):
+async def create_product(data: ProductCreate, session: AsyncSession = Depends(get_session, scope="function")):
     """Create a product and register it with the offers service."""
-    log.info("Creating product: name=%s", data.name)
+    # Register before touching the DB so no pool connection is held across the upstream call
+    product_id = uuid4()
+    log.debug("Registering product %s with external offers service", product_id)
+    client = OffersClient.get()
+    external_id = await client.register_product(product_id, data.name, data.description)
 
-    product = ProductModel(name=data.name, description=data.description)
+    product = ProductModel(id=product_id, name=data.name, description=data.description, external_id=external_id)
     session.add(product)
     await session.flush()
-    log.debug("Product saved to DB with id=%s", product.id)
-
-    log.info("Registering product %s with external offers service", product.id)
-    client = OffersClient.get()
-    external_id = await client.register_product(product.id, product.name, product.description)
-    product.external_id = external_id
-    log.info("Product %s registered with external_id=%s", product.id, external_id)
-
-    log.info("Product created successfully: id=%s, name=%s", product.id, product.name)
+    log.info("Product created: id=%s, external_id=%s", product.id, external_id)
     return product
 
 
-@router.get("", response_model=list[Product])
-async def list_products(session: AsyncSession = Depends(get_session)):
-    """List all products."""
+@router.get("", response_model=list[Product], responses={200: {"content": {"application/msgpack": {}}}})
+async def list_products(
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_read_session, scope="function"),
+):
+    """List all products (MessagePack with `Accept: application/msgpack`)."""
     log.debug("Fetching all products")
-    result = await session.execute(select(ProductModel))
+    result = await session.execute(select(ProductModel).where(ProductModel.deleted_at.is_(None)))
     products = result.scalars().all()
     log.info("Retrieved %d products", len(products))
+
+    set_vary_accept(response)
+    if wants_msgpack(request):
+        return msgpack_response(products_adapter, products, response)
     return products
 
 
-@router.get("/{product_id}", response_model=Product)
-async def get_product(product_id: UUID, session: AsyncSession = Depends(get_session)):
+@router.get("/{product_id}", response_model=Product, responses={304: {"description": "Not Modified"}})
+async def get_product(
+    product_id: UUID,
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_read_session, scope="function"),
+):
     """Get a single product."""
     log.debug("Fetching product: id=%s", product_id)
-    product = await session.get(ProductModel, product_id)
+    product = await _get_live_product(session, product_id)
     if not product:
         log.warning("Product not found: id=%s", product_id)
         raise HTTPException(status_code=404, detail="Product not found")
+
+    etag = make_etag(product.id, product.version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
     log.info("Retrieved product: id=%s, name=%s", product.id, product.name)
+    set_cache_headers(response, etag)
     return product
 
 
 @router.put("/{product_id}", response_model=Product)
-async def update_product(product_id: UUID, data: ProductUpdate, session: AsyncSession = Depends(get_session)):
+async def update_product(
+    product_id: UUID,
+    data: ProductUpdate,
+    session: AsyncSession = Depends(get_session, scope="function"),
+):
     """Update a product."""
     log.info("Updating product: id=%s", product_id)
-    product = await session.get(ProductModel, product_id)
+    # The version is bumped in SQL: a reconcile committing its own bump in between must not be overwritten
+    product = await session.scalar(
+        update(ProductModel)
+        .where(ProductModel.id == product_id, ProductModel.deleted_at.is_(None))
+        .values(name=data.name, description=data.description, version=ProductModel.version + 1)
+        .returning(ProductModel)
+    )
     if not product:
         log.warning("Product not found for update: id=%s", product_id)
         raise HTTPException(status_code=404, detail="Product not found")
 
-    product.name = data.name
-    product.description = data.description
-
     log.info("Product updated successfully: id=%s", product_id)
     return product
 
 
 @router.delete("/{product_id}", status_code=204)
-async def delete_product(product_id: UUID, session: AsyncSession = Depends(get_session)):
-    """Delete a product and its offers."""
+async def delete_product(product_id: UUID, session: AsyncSession = Depends(get_session, scope="function")):
+    """Delete a product and its offers.
+
+    Offers go with the product through ON DELETE CASCADE in the same statement. With
+    SOFT_DELETE the product is only marked deleted, which hides it from reads and the
+    sync at once; the purge job removes the rows later in batches.
+    """
     log.info("Deleting product: id=%s", product_id)
-    product = await session.get(ProductModel, product_id)
-    if not product:
+    statement: Update | Delete
+    if settings.soft_delete:
+        statement = (
+            update(ProductModel)
+            .where(ProductModel.id == product_id, ProductModel.deleted_at.is_(None))
+            .values(deleted_at=datetime.now(UTC))
+        )
+    else:
+        statement = delete(ProductModel).where(ProductModel.id == product_id)
+    product_name = await session.scalar(statement.returning(ProductModel.name))
+    if product_name is None:
         log.warning("Product not found for deletion: id=%s", product_id)
         raise HTTPException(status_code=404, detail="Product not found")
 
-    product_name = product.name
-    await session.delete(product)
+    await session.commit()  # evict only once the delete is durable, or a concurrent read could reload the product
+    snapshot.remove(product_id)
     log.info("Product deleted successfully: id=%s, name=%s", product_id, product_name)
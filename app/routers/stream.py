@@ -0,0 +1,60 @@
+"""Server-Sent Events feed of offer changes."""
+
+import asyncio
+import json
+import logging
+import typing as t
+from uuid import UUID
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.config import settings
+from app.services.events import SubscriptionDroppedError, bus
+
+log = logging.getLogger(__name__)
+router = APIRouter(prefix="/offers", tags=["offers"])
+
+
+async def event_stream(request: Request, product_ids: set[UUID]) -> t.AsyncIterator[str]:
+    """Subscribe to the products and render batches as SSE messages until the client goes away.
+
+    The subscription lives inside the generator: a client that disconnects before the
+    body is iterated never subscribes, so nothing is left behind on the bus.
+    """
+    sub = bus.subscribe(product_ids)
+    try:
+        while True:
+            try:
+                batch = await asyncio.wait_for(sub.get(), timeout=settings.stream_heartbeat_seconds)
+            except TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+                continue
+            except SubscriptionDroppedError:
+                yield "event: dropped\ndata: {}\n\n"
+                break
+            for event in batch:
+                yield f"event: offer\ndata: {json.dumps(event.to_dict())}\n\n"
+    finally:
+        bus.unsubscribe(sub)
+
+
+@router.get("/stream")
+async def stream_offer_changes(request: Request, product_id: list[UUID] = Query(...)):
+    """Stream offer added/updated/removed events for the given products.
+
+    Slow consumers get coalesced events and are disconnected with a `dropped`
+    event if they fall too far behind; clients should refetch offers and reconnect.
+    """
+    product_ids = set(product_id)
+    if len(product_ids) > settings.stream_max_products:
+        raise HTTPException(status_code=422, detail=f"At most {settings.stream_max_products} products per stream")
+
+    log.info("Offer stream opened for %d products", len(product_ids))
+    return StreamingResponse(
+        event_stream(request, product_ids),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -38,6 +38,19 @@ class Offer(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class SyncStatus(BaseModel):
+    status: str  # synced | pending
+    not_modified: bool | None = None
+    offer_changes: int | None = None
+
+
+class PricePoint(BaseModel):
+    bucket_start: datetime
+    min_price: int
+    max_price: int
+    samples: int
+
+
 # --- External service schemas ---
 
 
@@ -0,0 +1,142 @@
+"""Cross-process offer change feed backed by the offer_change table.
+
+Each sync writes its change events to `offer_change` in the reconcile transaction,
+tagged with the writing process. Every process tails the table and publishes rows
+written by other processes to its own bus and snapshot, so an on-demand sync in an
+API worker reaches stream subscribers and snapshots everywhere.
+"""
+
+import asyncio
+import logging
+import time
+import typing as t
+from datetime import UTC, datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy import CursorResult, delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db.database import db_session, read_session
+from app.db.models import OfferChange
+from app.services.events import OfferEvent, OfferEventKind, bus
+from app.services.snapshot import snapshot
+
+log = logging.getLogger(__name__)
+
+PROCESS_ID = uuid4()  # origin of the rows this process writes; it publishes those itself
+
+_BATCH_SIZE = 1000
+# A missing id may belong to a transaction that has not committed yet; wait this long before skipping it
+_GAP_TIMEOUT = 5.0
+_PRUNE_INTERVAL = 60.0
+
+
+async def record_changes(session: AsyncSession, events: list[OfferEvent]) -> None:
+    """Append change events to the feed, in the caller's transaction."""
+    if not settings.change_feed or not events:
+        return
+    await session.execute(
+        insert(OfferChange),
+        [
+            {
+                "product_id": e.product_id,
+                "offer_id": e.offer_id,
+                "kind": e.kind.value,
+                "old_price": e.old_price,
+                "new_price": e.new_price,
+                "old_stock": e.old_stock,
+                "new_stock": e.new_stock,
+                "origin": PROCESS_ID,
+                "created_at": datetime.now(UTC),
+            }
+            for e in events
+        ],
+    )
+
+
+def _to_event(row: OfferChange) -> OfferEvent:
+    return OfferEvent(
+        kind=OfferEventKind(row.kind),
+        product_id=row.product_id,
+        offer_id=row.offer_id,
+        old_price=row.old_price,
+        new_price=row.new_price,
+        old_stock=row.old_stock,
+        new_stock=row.new_stock,
+    )
+
+
+class ChangeFeedListener:
+    """Tails offer_change in id order and publishes other processes' events locally."""
+
+    def __init__(self) -> None:
+        self.cursor = 0
+        self._gap_since: float | None = None
+        self._last_prune = 0.0
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        """Start tailing from the current end of the feed."""
+        async with read_session() as session:
+            self.cursor = await session.scalar(select(func.max(OfferChange.id))) or 0
+        self._task = asyncio.create_task(self._run())
+        log.info("Offer change feed listener started at id %d", self.cursor)
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.poll()
+                if time.monotonic() - self._last_prune >= _PRUNE_INTERVAL:
+                    await self.prune()
+            except Exception:
+                log.exception("Offer change feed poll failed")
+            await asyncio.sleep(settings.change_feed_poll_seconds)
+
+    async def poll(self) -> list[OfferEvent]:
+        """Publish new rows of other processes. Returns the events published."""
+        async with read_session() as session:
+            result = await session.scalars(
+                select(OfferChange).where(OfferChange.id > self.cursor).order_by(OfferChange.id).limit(_BATCH_SIZE)
+            )
+            rows = list(result)
+
+        events = []
+        for row in rows:
+            if row.id != self.cursor + 1:
+                now = time.monotonic()
+                if self._gap_since is None:
+                    self._gap_since = now
+                if now - self._gap_since < _GAP_TIMEOUT:
+                    break
+                log.debug("Skipping offer change ids %d-%d", self.cursor + 1, row.id - 1)
+            self._gap_since = None
+            self.cursor = row.id
+            if row.origin != PROCESS_ID:
+                events.append(_to_event(row))
+
+        if events:
+            if snapshot.ready:
+                snapshot.apply(events)
+            bus.publish(events)
+        return events
+
+    async def prune(self) -> int:
+        """Delete rows older than CHANGE_FEED_RETENTION_SECONDS. Returns the number deleted."""
+        self._last_prune = time.monotonic()
+        cutoff = datetime.now(UTC) - timedelta(seconds=settings.change_feed_retention_seconds)
+        async with db_session() as session:
+            result = t.cast(
+                CursorResult, await session.execute(delete(OfferChange).where(OfferChange.created_at < cutoff))
+            )
+        return result.rowcount
+
+
+listener = ChangeFeedListener()
@@ -0,0 +1,134 @@
+"""In-process pub/sub bus for offer change events."""
+
+import asyncio
+import logging
+from dataclasses import dataclass, replace
+from enum import StrEnum
+from uuid import UUID
+
+from app.config import settings
+
+log = logging.getLogger(__name__)
+
+
+class OfferEventKind(StrEnum):
+    ADDED = "added"
+    UPDATED = "updated"
+    REMOVED = "removed"
+
+
+@dataclass(frozen=True)
+class OfferEvent:
+    """A single offer change produced by reconciliation."""
+
+    kind: OfferEventKind
+    product_id: UUID
+    offer_id: UUID
+    old_price: int | None = None
+    new_price: int | None = None
+    old_stock: int | None = None
+    new_stock: int | None = None
+
+    def to_dict(self) -> dict:
+        return {
+            "kind": self.kind.value,
+            "product_id": str(self.product_id),
+            "offer_id": str(self.offer_id),
+            "old_price": self.old_price,
+            "new_price": self.new_price,
+            "old_stock": self.old_stock,
+            "new_stock": self.new_stock,
+        }
+
+
+def _coalesce(prev: OfferEvent, new: OfferEvent) -> OfferEvent | None:
+    """Merge two pending events for the same offer. Returns None if they cancel out."""
+    if prev.kind == OfferEventKind.ADDED:
+        if new.kind == OfferEventKind.REMOVED:
+            return None
+        return replace(new, kind=OfferEventKind.ADDED, old_price=None, old_stock=None)
+
+    if new.kind == OfferEventKind.REMOVED:
+        return replace(new, old_price=prev.old_price, old_stock=prev.old_stock)
+
+    # prev was UPDATED or REMOVED: the subscriber has only seen prev's old values
+    merged = replace(new, kind=OfferEventKind.UPDATED, old_price=prev.old_price, old_stock=prev.old_stock)
+    if merged.old_price == merged.new_price and merged.old_stock == merged.new_stock:
+        return None
+    return merged
+
+
+class SubscriptionDroppedError(Exception):
+    """Raised to a consumer that fell too far behind and was disconnected."""
+
+
+class Subscription:
+    """Bounded, coalescing queue of events for one consumer.
+
+    Pending events are keyed by offer id, so a burst of changes to the same offer
+    occupies a single slot. A consumer with more than `max_pending` distinct offers
+    waiting is dropped rather than allowed to grow without bound.
+    """
+
+    def __init__(self, product_ids: frozenset[UUID], max_pending: int) -> None:
+        self.product_ids = product_ids
+        self.max_pending = max_pending
+        self.dropped = False
+        self._pending: dict[UUID, OfferEvent] = {}
+        self._wakeup = asyncio.Event()
+
+    def push(self, event: OfferEvent) -> None:
+        if self.dropped:
+            return
+        prev = self._pending.pop(event.offer_id, None)
+        if prev is not None:
+            merged = _coalesce(prev, event)
+            if merged is not None:
+                self._pending[event.offer_id] = merged
+        elif len(self._pending) >= self.max_pending:
+            log.warning("Dropping slow offer stream subscriber (%d events pending)", len(self._pending))
+            self.dropped = True
+            self._pending.clear()
+        else:
+            self._pending[event.offer_id] = event
+        self._wakeup.set()
+
+    async def get(self) -> list[OfferEvent]:
+        """Wait for and return all pending events."""
+        while not self._pending:
+            if self.dropped:
+                raise SubscriptionDroppedError
+            self._wakeup.clear()
+            await self._wakeup.wait()
+        batch = list(self._pending.values())
+        self._pending.clear()
+        return batch
+
+
+class OfferEventBus:
+    """Fans out offer events to subscribers interested in the affected product."""
+
+    def __init__(self) -> None:
+        self._subscribers: dict[UUID, set[Subscription]] = {}
+
+    def subscribe(self, product_ids: set[UUID], max_pending: int | None = None) -> Subscription:
+        sub = Subscription(frozenset(product_ids), max_pending or settings.stream_queue_size)
+        for product_id in sub.product_ids:
+            self._subscribers.setdefault(product_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        for product_id in sub.product_ids:
+            subs = self._subscribers.get(product_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[product_id]
+
+    def publish(self, events: list[OfferEvent]) -> None:
+        for event in events:
+            for sub in self._subscribers.get(event.product_id, ()):
+                sub.push(event)
+
+
+bus = OfferEventBus()
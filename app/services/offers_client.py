@@ -1,24 +1,72 @@
 """HTTP client for the external offers service."""
 
+import asyncio
 import logging
+import typing as t
+from dataclasses import dataclass
 from uuid import UUID
 
-import httpx
-
-from app.config import settings
+from app.config import OfferProviderSettings, settings
 from app.schemas import ExternalAuthResponse, ExternalOffer, ExternalRegistrationResponse
 
+if t.TYPE_CHECKING:
+    import httpx
+
 log = logging.getLogger(__name__)
 
 _instance: "OffersClient | None" = None
 
 
+@dataclass
+class OffersFetch:
+    """Result of a conditional offers fetch.
+
+    `offers` is None when the upstream answered 304 Not Modified.
+    """
+
+    offers: list[ExternalOffer] | None
+    etag: str | None = None
+    last_modified: str | None = None
+    content_length: int = 0
+
+    @property
+    def not_modified(self) -> bool:
+        return self.offers is None
+
+
+class RateLimiter:
+    """Spaces request starts at least 1/rate seconds apart; a rate of 0 disables it."""
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+
+    async def acquire(self) -> None:
+        if not self.interval:
+            return
+        now = asyncio.get_running_loop().time()
+        # Reserve the slot before sleeping, so concurrent callers queue up behind each other
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
 class OffersClient:
-    def __init__(self) -> None:
-        self.base_url = settings.offers_service_url.rstrip("/")
-        self.refresh_token = settings.offers_refresh_token.get_secret_value()
+    def __init__(
+        self,
+        transport: "httpx.AsyncBaseTransport | None" = None,
+        provider: OfferProviderSettings | None = None,
+    ) -> None:
+        # Imported here: only processes that talk to the offers service pay for loading httpx
+        import httpx
+
+        provider = provider or settings.primary_provider
+        self.base_url = provider.url.rstrip("/")
+        self.refresh_token = provider.refresh_token.get_secret_value()
         self.access_token: str | None = None
-        self._client = httpx.AsyncClient()
+        self._limiter = RateLimiter(provider.rate_limit)
+        self._client = httpx.AsyncClient(transport=transport, timeout=provider.timeout)
 
     @classmethod
     def get(cls) -> "OffersClient":
@@ -33,19 +81,27 @@ class OffersClient:
         """Close the shared instance's HTTP client."""
         global _instance
         if _instance is not None:
-            await _instance._client.aclose()
+            await _instance.aclose()
             _instance = None
 
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def _send(self, method: str, url: str, **kwargs) -> "httpx.Response":
+        await self._limiter.acquire()
+        return await self._client.request(method, url, **kwargs)
+
     async def _authenticate(self) -> None:
         """Exchange refresh token for access token."""
-        response = await self._client.post(
+        response = await self._send(
+            "POST",
             f"{self.base_url}/api/v1/auth",
             headers={"Bearer": self.refresh_token},
         )
         response.raise_for_status()
         data = ExternalAuthResponse.model_validate(response.json())
         self.access_token = data.access_token
-        log.info("Authenticated with offers service")
+        log.info("Authenticated with offers service %s", self.base_url)
 
     async def ensure_authenticated(self) -> None:
         """Authenticate if no valid token is cached."""
@@ -62,21 +118,22 @@ class OffersClient:
         method: str,
         url: str,
         **kwargs,
-    ) -> httpx.Response:
+    ) -> "httpx.Response":
         """Make a request, re-authenticate on 401 and retry once."""
         if not self.access_token:
             await self._authenticate()
 
         kwargs.setdefault("headers", {}).update(self._auth_headers())
-        response = await self._client.request(method, url, **kwargs)
+        response = await self._send(method, url, **kwargs)
 
         if response.status_code == 401:
             log.info("Token expired, re-authenticating...")
             await self._authenticate()
             kwargs["headers"].update(self._auth_headers())
-            response = await self._client.request(method, url, **kwargs)
+            response = await self._send(method, url, **kwargs)
 
-        response.raise_for_status()
+        if response.status_code != 304:  # httpx treats 304 as an error, for us it means "unchanged"
+            response.raise_for_status()
         return response
 
     async def register_product(self, product_id: UUID, name: str, description: str | None) -> UUID:
@@ -89,10 +146,34 @@ class OffersClient:
         data = ExternalRegistrationResponse.model_validate(response.json())
         return data.id
 
-    async def get_offers(self, product_id: UUID) -> list[ExternalOffer]:
-        """Fetch offers for a product."""
+    async def fetch_offers(
+        self,
+        product_id: UUID,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> OffersFetch:
+        """Fetch offers for a product, revalidating against previously seen validators."""
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
         response = await self._request_with_retry(
             "GET",
             f"{self.base_url}/api/v1/products/{product_id}/offers",
+            headers=headers,
+        )
+        if response.status_code == 304:
+            # Keep the old validators if the upstream omits them on 304
+            return OffersFetch(
+                offers=None,
+                etag=response.headers.get("etag", etag),
+                last_modified=response.headers.get("last-modified", last_modified),
+            )
+        return OffersFetch(
+            offers=[ExternalOffer.model_validate(o) for o in response.json()],
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+            content_length=len(response.content),
         )
-        return [ExternalOffer.model_validate(o) for o in response.json()]
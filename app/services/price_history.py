@@ -0,0 +1,235 @@
+"""Offer price history recording and downsampled series queries."""
+
+import logging
+import math
+from datetime import UTC, datetime, timedelta
+from uuid import UUID
+
+from sqlalchemy import ColumnElement, Integer, SQLColumnExpression, Select, case, cast, func, insert, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db.models import Offer as OfferModel, OfferHistory, OfferPriceRange, OfferPriceRollup
+from app.schemas import PricePoint
+from app.services.events import OfferEvent, OfferEventKind
+
+log = logging.getLogger(__name__)
+
+ROLLUP_WIDTH = timedelta(hours=1)
+
+
+def _lowest(*prices: int | None) -> int | None:
+    known = [p for p in prices if p is not None]
+    return min(known) if known else None
+
+
+def _highest(*prices: int | None) -> int | None:
+    known = [p for p in prices if p is not None]
+    return max(known) if known else None
+
+
+async def record_history(
+    session: AsyncSession,
+    product_id: UUID,
+    events: list[OfferEvent],
+    now: datetime | None = None,
+) -> None:
+    """Append history rows for changed offers and record the product's resulting price range.
+
+    The range spans all live offers of the product, unchanged ones included, and is
+    folded into the hourly rollup.
+    """
+    now = now or datetime.now(UTC)
+    rows = [
+        {
+            "product_id": product_id,
+            "offer_id": e.offer_id,
+            "price": e.new_price,
+            "items_in_stock": e.new_stock,
+            "recorded_at": now,
+        }
+        for e in events
+        if e.kind != OfferEventKind.REMOVED
+    ]
+    if rows:
+        await session.execute(insert(OfferHistory), rows)
+
+    await session.flush()  # offers added by the reconcile count towards the range
+    result = await session.execute(
+        select(func.min(OfferModel.price), func.max(OfferModel.price)).where(OfferModel.product_id == product_id)
+    )
+    low, high = result.one()
+    session.add(
+        OfferPriceRange(product_id=product_id, recorded_at=now, min_price=low, max_price=high, changes=len(events))
+    )
+
+    bucket_start = now.replace(minute=0, second=0, microsecond=0)
+    # A new hour opens with the range the last rolled-up hour closed with
+    previous = (await session.execute(
+        select(OfferPriceRollup.close_min_price, OfferPriceRollup.close_max_price)
+        .where(OfferPriceRollup.product_id == product_id, OfferPriceRollup.bucket_start < bucket_start)
+        .order_by(OfferPriceRollup.bucket_start.desc())
+        .limit(1)
+    )).first()
+    await _upsert_rollup(
+        session,
+        {
+            "product_id": product_id,
+            "bucket_start": bucket_start,
+            "min_price": _lowest(previous.close_min_price if previous else None, low),
+            "max_price": _highest(previous.close_max_price if previous else None, high),
+            "close_min_price": low,
+            "close_max_price": high,
+            "samples": len(events),
+        },
+    )
+
+
+async def _upsert_rollup(session: AsyncSession, values: dict) -> None:
+    """Insert the hour's rollup or fold `values` into it, atomically.
+
+    Processes may reconcile the same product within one hour, so a read-then-insert
+    would let one of them fail on the primary key and lose its whole reconcile.
+    """
+    dialect = session.get_bind().dialect.name
+    upsert = sqlite_insert(OfferPriceRollup) if dialect == "sqlite" else postgresql_insert(OfferPriceRollup)
+    upsert = upsert.values(**values)
+    # NULL (no offers) never wins: each side falls back to the other before comparing
+    least, greatest = (func.min, func.max) if dialect == "sqlite" else (func.least, func.greatest)
+    stored, new = OfferPriceRollup.__table__.c, upsert.excluded
+    await session.execute(
+        upsert.on_conflict_do_update(
+            index_elements=[stored.product_id, stored.bucket_start],
+            set_={
+                "min_price": least(
+                    func.coalesce(stored.min_price, new.min_price), func.coalesce(new.min_price, stored.min_price)
+                ),
+                "max_price": greatest(
+                    func.coalesce(stored.max_price, new.max_price), func.coalesce(new.max_price, stored.max_price)
+                ),
+                "close_min_price": new.close_min_price,
+                "close_max_price": new.close_max_price,
+                "samples": stored.samples + new.samples,
+            },
+        )
+    )
+
+
+def _bucket_index(
+    ts: SQLColumnExpression[datetime], start: datetime, width: timedelta, dialect: str
+) -> ColumnElement[int]:
+    """Zero-based index of the `width`-wide bucket after `start` that `ts` falls into."""
+    if dialect == "sqlite":
+        # julianday() counts days; 2440587.5 is the Unix epoch. Offsets are never negative, so truncating floors
+        offset = (func.julianday(ts) - 2440587.5) * 86400.0 - start.timestamp()
+        return cast(offset / width.total_seconds(), Integer)
+    offset = func.extract("epoch", ts) - start.timestamp()
+    return cast(func.floor(offset / width.total_seconds()), Integer)
+
+
+def _buckets_query(
+    ts: SQLColumnExpression[datetime],
+    low: SQLColumnExpression[int | None],
+    high: SQLColumnExpression[int | None],
+    close_low: SQLColumnExpression[int | None],
+    close_high: SQLColumnExpression[int | None],
+    samples: SQLColumnExpression[int],
+    product_filter: SQLColumnExpression[bool],
+    start: datetime,
+    end: datetime,
+    width: timedelta,
+    dialect: str,
+) -> Select:
+    """Per bucket: min/max of the ranges recorded in it, their sample count and the range it closes with."""
+    idx = _bucket_index(ts, start, width, dialect)
+    ranked = (
+        select(
+            idx.label("idx"),
+            low.label("low"),
+            high.label("high"),
+            close_low.label("close_low"),
+            close_high.label("close_high"),
+            samples.label("samples"),
+            func.row_number().over(partition_by=idx, order_by=ts.desc()).label("latest"),
+        )
+        .where(product_filter, ts >= start, ts < end)
+        .subquery()
+    )
+    return (
+        select(
+            ranked.c.idx,
+            func.min(ranked.c.low).label("min_price"),
+            func.max(ranked.c.high).label("max_price"),
+            func.sum(ranked.c.samples).label("samples"),
+            func.max(case((ranked.c.latest == 1, ranked.c.close_low))).label("close_min"),
+            func.max(case((ranked.c.latest == 1, ranked.c.close_high))).label("close_max"),
+        )
+        .group_by(ranked.c.idx)
+        .order_by(ranked.c.idx)
+    )
+
+
+async def price_series(
+    session: AsyncSession,
+    product_id: UUID,
+    start: datetime,
+    end: datetime,
+    points: int,
+) -> list[PricePoint]:
+    """Return at most `points` min/max price buckets for a product between `start` and `end`.
+
+    A bucket spans every offer live during it: the range in effect when it starts is
+    carried forward from the last change before it, so quiet periods keep their prices.
+    Short windows are grouped from per-change ranges, longer ones from hourly rollups,
+    so the query cost depends on the window length in hours, not on the number of changes.
+    Buckets before the first recorded change, or while the product has no offers, are omitted.
+    """
+    dialect = session.get_bind().dialect.name
+    width = (end - start) / points
+    if end - start <= timedelta(hours=settings.history_raw_window_hours):
+        r = OfferPriceRange
+        buckets = _buckets_query(
+            r.recorded_at, r.min_price, r.max_price, r.min_price, r.max_price, r.changes,
+            r.product_id == product_id, start, end, width, dialect,
+        )
+        carried = (
+            select(r.min_price, r.max_price)
+            .where(r.product_id == product_id, r.recorded_at < start)
+            .order_by(r.recorded_at.desc())
+            .limit(1)
+        )
+    else:
+        width = max(width, ROLLUP_WIDTH)
+        h = OfferPriceRollup
+        buckets = _buckets_query(
+            h.bucket_start, h.min_price, h.max_price, h.close_min_price, h.close_max_price, h.samples,
+            h.product_id == product_id, start, end, width, dialect,
+        )
+        carried = (
+            select(h.close_min_price, h.close_max_price)
+            .where(h.product_id == product_id, h.bucket_start < start)
+            .order_by(h.bucket_start.desc())
+            .limit(1)
+        )
+
+    rows = {row.idx: row for row in (await session.execute(buckets)).all()}
+    previous = (await session.execute(carried)).first()
+    low: int | None = previous[0] if previous else None
+    high: int | None = previous[1] if previous else None
+
+    series = []
+    for idx in range(math.ceil((end - start) / width)):
+        row = rows.get(idx)
+        samples = 0
+        bucket_low, bucket_high = low, high
+        if row is not None:
+            bucket_low, bucket_high = _lowest(low, row.min_price), _highest(high, row.max_price)
+            samples = row.samples
+            low, high = row.close_min, row.close_max
+        if bucket_low is not None and bucket_high is not None:
+            series.append(PricePoint(
+                bucket_start=start + idx * width, min_price=bucket_low, max_price=bucket_high, samples=samples
+            ))
+    return series
@@ -0,0 +1,73 @@
+"""Configured offer providers and their per-provider fetch metrics."""
+
+import statistics
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+
+from app.config import PRIMARY_SOURCE, settings
+from app.services.offers_client import OffersClient
+
+_LATENCY_WINDOW = 1000  # recent fetches kept per provider for percentiles
+
+# Clients of OFFER_PROVIDERS by name; the main service keeps using the OffersClient singleton
+_extra_clients: dict[str, OffersClient] = {}
+
+
+@dataclass
+class OfferProvider:
+    """One offers source: the name stored in offer.source, its client and its fetch deadline."""
+
+    name: str
+    client: OffersClient
+    timeout: float
+
+
+@dataclass
+class ProviderMetrics:
+    """Fetch outcomes and latencies of one provider since process start."""
+
+    fetches: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    _latencies: deque[float] = field(default_factory=lambda: deque(maxlen=_LATENCY_WINDOW))
+
+    def observe(self, seconds: float) -> None:
+        self.fetches += 1
+        self._latencies.append(seconds)
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+        summary: dict = {"fetches": self.fetches, "errors": self.errors, "timeouts": self.timeouts}
+        if latencies:
+            summary["latency_ms"] = {
+                "p50": round(statistics.median(latencies) * 1000, 1),
+                "p95": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 1),
+                "max": round(latencies[-1] * 1000, 1),
+            }
+        return summary
+
+
+provider_metrics: defaultdict[str, ProviderMetrics] = defaultdict(ProviderMetrics)
+
+
+def offer_providers() -> list[OfferProvider]:
+    """The main offers service first, then OFFER_PROVIDERS in configured order."""
+    providers = [OfferProvider(PRIMARY_SOURCE, OffersClient.get(), settings.offers_service_timeout)]
+    for config in settings.offer_providers:
+        client = _extra_clients.get(config.name)
+        if client is None:
+            client = _extra_clients[config.name] = OffersClient(provider=config)
+        providers.append(OfferProvider(config.name, client, config.timeout))
+    return providers
+
+
+async def close_providers() -> None:
+    """Close the HTTP clients of all providers."""
+    await OffersClient.close()
+    for client in _extra_clients.values():
+        await client.aclose()
+    _extra_clients.clear()
+
+
+def provider_stats() -> dict[str, dict]:
+    return {name: metrics.stats() for name, metrics in provider_metrics.items()}
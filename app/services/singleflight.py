@@ -0,0 +1,65 @@
+"""Collapse concurrent identical async calls into one execution."""
+
+import asyncio
+import typing as t
+
+K = t.TypeVar("K", bound=t.Hashable)
+V = t.TypeVar("V")
+
+
+class SingleFlight(t.Generic[K, V]):
+    """Share one in-flight call per key between all concurrent callers.
+
+    Nothing is cached: once the call finishes, the next caller starts a fresh one.
+    The call runs in its own task, so a cancelled caller (e.g. a client disconnect)
+    does not cancel it for the other waiters.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: dict[K, asyncio.Future[V]] = {}
+        self.calls = 0
+        self.executions = 0
+
+    @property
+    def coalesced(self) -> int:
+        return self.calls - self.executions
+
+    def start(self, key: K, fn: t.Callable[[], t.Awaitable[V]]) -> "asyncio.Future[V]":
+        """Join the in-flight call for `key`, or start one, without waiting for it."""
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return task
+
+    async def do(self, key: K, fn: t.Callable[[], t.Awaitable[V]]) -> V:
+        return await asyncio.shield(self.start(key, fn))
+
+    async def drain(self, timeout: float | None = None) -> int:
+        """Wait up to `timeout` seconds for the calls in flight, then cancel the rest. Returns the number cancelled."""
+        tasks = set(self._inflight.values())
+        if not tasks:
+            return 0
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+        return len(pending)
+
+    def _forget(self, key: K, task: "asyncio.Future[V]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every waiter was cancelled
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
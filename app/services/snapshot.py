@@ -0,0 +1,196 @@
+"""Compact in-memory snapshot of the offer table for DB-free hot reads."""
+
+import logging
+import time
+from array import array
+from collections.abc import Iterable
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db.database import read_session
+from app.db.models import Offer as OfferModel, Product as ProductModel
+from app.services.events import OfferEvent, OfferEventKind
+
+log = logging.getLogger(__name__)
+
+OfferRow = tuple[UUID, int, int]  # (offer id, price, items_in_stock)
+
+_COMPACT_MIN_GARBAGE = 1024
+_UNKNOWN_VERSION = -1  # block built from events alone; the next revalidation reloads it
+
+
+class OfferSnapshot:
+    """Columnar copy of all offers, grouped by product and sorted by price.
+
+    Offers live in three parallel columns: ids as 16-byte slices of one bytearray,
+    prices and stock as 32-bit int arrays. Each product owns a contiguous
+    [start, end) range. Updating a product appends a fresh block and abandons the
+    old range; the columns are compacted once abandoned rows outnumber live ones.
+
+    Each block remembers the product version it reflects and when that was last
+    checked. Blocks older than SNAPSHOT_MAX_STALENESS are revalidated against the
+    database on read, which picks up syncs and deletes made by other processes.
+
+    Memory: 24 bytes per offer in the columns (~24 MB per million offers, up to
+    ~48 MB transiently during compaction), plus roughly 400 bytes per product for
+    the range and version index.
+    """
+
+    def __init__(self) -> None:
+        self.ready = False
+        self._ids = bytearray()
+        self._prices = array("i")
+        self._stock = array("i")
+        self._ranges: dict[UUID, tuple[int, int]] = {}
+        self._checked: dict[UUID, tuple[int, float]] = {}  # product version and when it was verified
+        self._garbage = 0
+
+    def __contains__(self, product_id: UUID) -> bool:
+        return self.ready and product_id in self._ranges
+
+    def _rows(self, product_id: UUID) -> Iterable[OfferRow]:
+        start, end = self._ranges[product_id]
+        for i in range(start, end):
+            yield UUID(bytes=bytes(self._ids[i * 16:(i + 1) * 16])), self._prices[i], self._stock[i]
+
+    def replace(self, product_id: UUID, offers: Iterable[OfferRow], version: int | None = None) -> None:
+        """Set the full offer list of a product, as of `version` if known."""
+        if version is not None:
+            self._checked[product_id] = (version, time.monotonic())
+        elif product_id not in self._checked:
+            self._checked[product_id] = (_UNKNOWN_VERSION, time.monotonic())
+
+        old = self._ranges.get(product_id)
+        if old is not None:
+            self._garbage += old[1] - old[0]
+
+        start = len(self._prices)
+        for offer_id, price, stock in sorted(offers, key=lambda o: o[1]):
+            self._ids += offer_id.bytes
+            self._prices.append(price)
+            self._stock.append(stock)
+        self._ranges[product_id] = (start, len(self._prices))
+
+        if self._garbage > max(_COMPACT_MIN_GARBAGE, len(self._prices) - self._garbage):
+            self._compact()
+
+    def remove(self, product_id: UUID) -> None:
+        self._checked.pop(product_id, None)
+        old = self._ranges.pop(product_id, None)
+        if old is not None:
+            self._garbage += old[1] - old[0]
+
+    def apply(self, events: list[OfferEvent]) -> None:
+        """Fold reconciler change events into the affected products' blocks."""
+        changed: dict[UUID, dict[UUID, tuple[int, int]]] = {}
+        for event in events:
+            offers = changed.get(event.product_id)
+            if offers is None:
+                current = self._rows(event.product_id) if event.product_id in self._ranges else ()
+                offers = changed[event.product_id] = {oid: (price, stock) for oid, price, stock in current}
+            if event.kind == OfferEventKind.REMOVED:
+                offers.pop(event.offer_id, None)
+            else:
+                offers[event.offer_id] = (event.new_price, event.new_stock)  # type: ignore[assignment]
+
+        for product_id, offers in changed.items():
+            self.replace(product_id, ((oid, price, stock) for oid, (price, stock) in offers.items()))
+
+    async def revalidate(self, product_id: UUID) -> bool:
+        """Whether the product can be served from the snapshot, checking it against the database first if stale.
+
+        A stale block costs one single-row version lookup. A product that is gone or
+        soft-deleted is evicted; one whose version moved on is reloaded.
+        """
+        if product_id not in self:
+            return False
+        version, checked_at = self._checked[product_id]
+        if time.monotonic() - checked_at < settings.snapshot_max_staleness:
+            return True
+
+        async with read_session() as session:
+            current = await session.scalar(
+                select(ProductModel.version).where(ProductModel.id == product_id, ProductModel.deleted_at.is_(None))
+            )
+            if current is None:
+                self.remove(product_id)
+                return False
+            if current == version:
+                self._checked[product_id] = (version, time.monotonic())
+                return True
+            result = await session.execute(
+                select(OfferModel.id, OfferModel.price, OfferModel.items_in_stock).where(
+                    OfferModel.product_id == product_id
+                )
+            )
+            offers = [(offer_id, price, stock) for offer_id, price, stock in result]
+        self.replace(product_id, offers, current)
+        return True
+
+    def _compact(self) -> None:
+        ids, prices, stock = bytearray(), array("i"), array("i")
+        for product_id, (start, end) in self._ranges.items():
+            new_start = len(prices)
+            ids += self._ids[start * 16:end * 16]
+            prices.extend(self._prices[start:end])
+            stock.extend(self._stock[start:end])
+            self._ranges[product_id] = (new_start, len(prices))
+        self._ids, self._prices, self._stock = ids, prices, stock
+        self._garbage = 0
+
+    def offers(self, product_id: UUID) -> list[OfferRow]:
+        """All offers of a product, cheapest first."""
+        return list(self._rows(product_id))
+
+    def best_offer(self, product_id: UUID) -> OfferRow | None:
+        """Cheapest offer with stock, or None if everything is sold out."""
+        start, end = self._ranges[product_id]
+        for i in range(start, end):
+            if self._stock[i] > 0:
+                return UUID(bytes=bytes(self._ids[i * 16:(i + 1) * 16])), self._prices[i], self._stock[i]
+        return None
+
+    def in_stock_ids(self, product_id: UUID) -> list[UUID]:
+        """Ids of offers with stock, cheapest first."""
+        start, end = self._ranges[product_id]
+        return [UUID(bytes=bytes(self._ids[i * 16:(i + 1) * 16])) for i in range(start, end) if self._stock[i] > 0]
+
+    async def load(self, session: AsyncSession) -> None:
+        """Build the snapshot from the database, streaming rows product by product."""
+        self.__init__()  # type: ignore[misc]
+        result = await session.stream(
+            select(ProductModel.id, ProductModel.version, OfferModel.id, OfferModel.price, OfferModel.items_in_stock)
+            .outerjoin(OfferModel, OfferModel.product_id == ProductModel.id)
+            .where(ProductModel.deleted_at.is_(None))
+            .order_by(ProductModel.id, OfferModel.price)
+            .execution_options(yield_per=10_000)
+        )
+        current: UUID | None = None
+        current_version = 0
+        block: list[OfferRow] = []
+        async for product_id, version, offer_id, price, stock in result:
+            if product_id != current:
+                if current is not None:
+                    self.replace(current, block, current_version)
+                current, current_version, block = product_id, version, []
+            if offer_id is not None:
+                block.append((offer_id, price, stock))
+        if current is not None:
+            self.replace(current, block, current_version)
+        self.ready = True
+        log.info("Offer snapshot loaded: %s", self.stats())
+
+    def stats(self) -> dict[str, int]:
+        live = len(self._prices) - self._garbage
+        return {
+            "products": len(self._ranges),
+            "offers": live,
+            "garbage": self._garbage,
+            "column_bytes": len(self._ids) + self._prices.itemsize * len(self._prices) * 2,
+        }
+
+
+snapshot = OfferSnapshot()
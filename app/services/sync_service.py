@@ -1,62 +1,358 @@
 """Offer synchronization logic."""
 
+import asyncio
 import logging
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
 from datetime import UTC, datetime
 from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import Select, delete, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.models import Offer as OfferModel
+from app.config import PRIMARY_SOURCE, settings
+from app.db.database import db_session, read_session
+from app.db.models import Offer as OfferModel, OfferSyncState, Product as ProductModel
 from app.schemas import ExternalOffer
+from app.services.change_feed import record_changes
+from app.services.events import OfferEvent, OfferEventKind, bus
+from app.services.offers_client import OffersFetch
+from app.services.price_history import record_history
+from app.services.providers import OfferProvider, provider_metrics
+from app.services.singleflight import SingleFlight
+from app.services.snapshot import snapshot
 
 log = logging.getLogger(__name__)
 
 
+@dataclass
+class SyncStats:
+    """Counters for a single sync cycle. Fetch outcomes count per product and provider."""
+
+    products: int = 0
+    reconciled: int = 0
+    not_modified: int = 0
+    failed: int = 0  # products no provider could be fetched for
+    provider_errors: int = 0  # failed fetches from a provider while others answered
+    bytes_downloaded: int = 0
+    bytes_saved: int = 0  # body sizes not re-downloaded thanks to 304s
+    offer_changes: int = 0
+
+    def add(self, other: "SyncStats") -> None:
+        self.reconciled += other.reconciled
+        self.not_modified += other.not_modified
+        self.failed += other.failed
+        self.provider_errors += other.provider_errors
+        self.bytes_downloaded += other.bytes_downloaded
+        self.bytes_saved += other.bytes_saved
+        self.offer_changes += other.offer_changes
+
+
+def existing_offers_query(product_id: UUID) -> Select:
+    """Columns needed to diff a product's offers, served from ix_offer_product_id_price alone."""
+    return select(OfferModel.id, OfferModel.price, OfferModel.items_in_stock, OfferModel.source).where(
+        OfferModel.product_id == product_id
+    )
+
+
 class OfferReconciler:
-    """Reconciles external offers with database state."""
+    """Reconciles one provider's external offers with database state.
 
-    def __init__(self, session: AsyncSession, product_id: UUID) -> None:
+    Only offers of `source` are updated or removed. An offer id already stored for
+    another source belongs to that source, so a duplicate from this one is ignored
+    and recorded in `skipped`.
+    """
+
+    def __init__(self, session: AsyncSession, product_id: UUID, source: str = PRIMARY_SOURCE) -> None:
         self.session = session
         self.product_id = product_id
-        self.db_offers: dict[UUID, OfferModel] = {}
+        self.source = source
+        self.db_offers: dict[UUID, tuple[int, int]] = {}  # id -> (price, items_in_stock)
+        self.other_sources: set[UUID] = set()  # ids of this product's offers held by other sources
+        self.skipped: set[UUID] = set()  # ids this source offered that another source holds
+        self.events: list[OfferEvent] = []
+        self._updates: list[dict] = []
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.events)
 
     async def load_existing(self) -> None:
-        """Load current offers from database."""
-        result = await self.session.execute(
-            select(OfferModel).where(OfferModel.product_id == self.product_id)
-        )
-        self.db_offers = {o.id: o for o in result.scalars().all()}
+        """Load current offer prices and stock from database."""
+        result = await self.session.execute(existing_offers_query(self.product_id))
+        for row in result:
+            if row.source == self.source:
+                self.db_offers[row.id] = (row.price, row.items_in_stock)
+            else:
+                self.other_sources.add(row.id)
 
     def upsert(self, external: ExternalOffer) -> None:
-        """Insert or update a single offer."""
-        if external.id in self.db_offers:
-            db_offer = self.db_offers[external.id]
-            db_offer.last_seen_at = datetime.now(UTC)
-            if db_offer.price != external.price or db_offer.items_in_stock != external.items_in_stock:
-                db_offer.price = external.price
-                db_offer.items_in_stock = external.items_in_stock
-        else:
+        """Insert or queue an update for a single offer."""
+        if external.id in self.other_sources:
+            self.skipped.add(external.id)
+            return
+        current = self.db_offers.get(external.id)
+        if current is None:
+            self.events.append(OfferEvent(
+                kind=OfferEventKind.ADDED,
+                product_id=self.product_id,
+                offer_id=external.id,
+                new_price=external.price,
+                new_stock=external.items_in_stock,
+            ))
             self.session.add(OfferModel(
                 id=external.id,
                 product_id=self.product_id,
                 price=external.price,
                 items_in_stock=external.items_in_stock,
+                source=self.source,
+            ))
+        elif current != (external.price, external.items_in_stock):
+            old_price, old_stock = current
+            self.events.append(OfferEvent(
+                kind=OfferEventKind.UPDATED,
+                product_id=self.product_id,
+                offer_id=external.id,
+                old_price=old_price,
+                new_price=external.price,
+                old_stock=old_stock,
+                new_stock=external.items_in_stock,
             ))
+            self._updates.append(
+                {"id": external.id, "price": external.price, "items_in_stock": external.items_in_stock}
+            )
+
+    async def apply_updates(self) -> None:
+        """Write queued price/stock changes and mark the product's remaining offers as seen."""
+        if self._updates:
+            await self.session.execute(update(OfferModel), self._updates)
+        await self.session.execute(
+            update(OfferModel)
+            .where(OfferModel.product_id == self.product_id, OfferModel.source == self.source)
+            .values(last_seen_at=datetime.now(UTC))
+        )
 
     async def remove_stale(self, current_ids: set[UUID]) -> None:
         """Remove offers no longer present externally."""
-        for offer_id, db_offer in self.db_offers.items():
-            if offer_id not in current_ids:
-                await self.session.delete(db_offer)
+        stale_ids = [offer_id for offer_id in self.db_offers if offer_id not in current_ids]
+        if not stale_ids:
+            return
+        await self.session.execute(delete(OfferModel).where(OfferModel.id.in_(stale_ids)))
+        for offer_id in stale_ids:
+            old_price, old_stock = self.db_offers[offer_id]
+            self.events.append(OfferEvent(
+                kind=OfferEventKind.REMOVED,
+                product_id=self.product_id,
+                offer_id=offer_id,
+                old_price=old_price,
+                old_stock=old_stock,
+            ))
+
+    async def bump_version(self) -> None:
+        """Increment the product's version so cached ETags are invalidated."""
+        await self.session.execute(
+            update(ProductModel)
+            .where(ProductModel.id == self.product_id)
+            # Offer changes are not product edits, keep updated_at untouched
+            .values(version=ProductModel.version + 1, updated_at=ProductModel.updated_at)
+        )
 
     async def reconcile(self, external_offers: list[ExternalOffer]) -> None:
-        """Full reconciliation: load, upsert, remove stale."""
+        """Full reconciliation: load, upsert, remove stale, record history."""
         await self.load_existing()
 
         external_ids = set()
         for ext in external_offers:
+            if ext.id in external_ids:
+                continue  # repeated within one response
             external_ids.add(ext.id)
             self.upsert(ext)
 
         await self.remove_stale(external_ids)
+        await self.apply_updates()
+
+        if self.changed:
+            await self.bump_version()
+            await record_history(self.session, self.product_id, self.events)
+
+
+async def _fetch_from(
+    provider: OfferProvider,
+    state: OfferSyncState,
+    external_id: UUID,
+    product: ProductModel | None,
+) -> OffersFetch:
+    """Fetch one provider's offers within its deadline, registering the product with it first if needed."""
+    metrics = provider_metrics[provider.name]
+    start = time.perf_counter()
+    try:
+        async with asyncio.timeout(provider.timeout):
+            if provider.name != PRIMARY_SOURCE:
+                if state.external_id is None:
+                    if product is None:
+                        raise LookupError(f"Product {state.product_id} no longer exists")
+                    state.external_id = await provider.client.register_product(
+                        product.id, product.name, product.description
+                    )
+                    log.info("Registered product %s with offers provider %s", product.id, provider.name)
+                external_id = state.external_id
+            return await provider.client.fetch_offers(external_id, etag=state.etag, last_modified=state.last_modified)
+    except TimeoutError:
+        metrics.timeouts += 1
+        raise
+    except Exception:
+        metrics.errors += 1
+        raise
+    finally:
+        metrics.observe(time.perf_counter() - start)
+
+
+async def _apply_fetch(
+    session: AsyncSession,
+    state: OfferSyncState,
+    fetch: OffersFetch,
+    stats: SyncStats,
+) -> list[OfferEvent]:
+    """Store a provider's validators and reconcile its offers unless it reported no change.
+
+    Validators are dropped when offers were skipped as another source's: once that
+    source removes them this one must answer in full, not with a 304, to take them over.
+    """
+    state.etag = fetch.etag
+    state.last_modified = fetch.last_modified
+    state.synced_at = datetime.now(UTC)
+
+    if fetch.not_modified:
+        stats.not_modified += 1
+        stats.bytes_saved += state.content_length
+        log.debug("Offers from %s not modified for product %s", state.source, state.product_id)
+        return []
+
+    state.content_length = fetch.content_length
+    stats.bytes_downloaded += fetch.content_length
+
+    reconciler = OfferReconciler(session, state.product_id, state.source)
+    await reconciler.reconcile(fetch.offers)  # type: ignore[arg-type]  # not None unless not_modified
+    if reconciler.skipped:
+        state.etag = state.last_modified = None
+    stats.reconciled += 1
+    stats.offer_changes += len(reconciler.events)
+    return reconciler.events
+
+
+async def _load_sync_states(
+    product_id: UUID, providers: list[OfferProvider]
+) -> tuple[dict[str, OfferSyncState], ProductModel | None]:
+    """Stored validators per source, plus the product if a provider still needs it registered.
+
+    Read in a short session of its own, so no connection is held across the upstream calls.
+    """
+    async with read_session() as session:
+        result = await session.scalars(select(OfferSyncState).where(OfferSyncState.product_id == product_id))
+        states = {state.source: state for state in result}
+        for provider in providers:
+            if provider.name not in states:
+                states[provider.name] = OfferSyncState(product_id=product_id, source=provider.name, content_length=0)
+
+        product = None
+        if any(p.name != PRIMARY_SOURCE and states[p.name].external_id is None for p in providers):
+            product = await session.get(ProductModel, product_id)
+    return states, product
+
+
+async def sync_product(
+    providers: list[OfferProvider],
+    product_id: UUID,
+    external_id: UUID,
+    stats: SyncStats,
+    publish: Callable[[list[OfferEvent]], None] | None = None,
+) -> list[OfferEvent]:
+    """Fetch offers for one product from all providers in parallel and reconcile each source as it answers.
+
+    Every provider is bounded by its own timeout, so a slow one only costs its own
+    offers: they are kept as they were and retried next time. Each response is
+    reconciled in a short transaction of its own as soon as it arrives, so neither a
+    connection nor the other sources wait for the slowest provider. `publish` gets
+    each source's events once its transaction commits. Raises only if no provider
+    could be fetched. Returns all change events.
+    """
+    states, product = await _load_sync_states(product_id, providers)
+    # One write at a time, so a source sees the offers committed by the one before it and skips their ids
+    write_lock = asyncio.Lock()
+    fetch_errors: list[Exception] = []
+    events: list[OfferEvent] = []
+
+    def committed(source_events: list[OfferEvent]) -> None:
+        events.extend(source_events)
+        if publish is not None and source_events:
+            publish(source_events)
+
+    async def sync_source(provider: OfferProvider) -> None:
+        state = states[provider.name]
+        unregistered = state.external_id is None
+        try:
+            fetch = await _fetch_from(provider, state, external_id, product)
+        except Exception as exc:
+            fetch_errors.append(exc)
+            stats.provider_errors += 1
+            log.warning(
+                "Failed to fetch offers for product %s from %s, keeping its offers",
+                product_id,
+                provider.name,
+                exc_info=exc,
+            )
+            if unregistered and state.external_id is not None:
+                async with write_lock, db_session() as session:
+                    await session.merge(state)  # keep the registration for the next attempt
+            return
+
+        async with write_lock:
+            async with db_session() as session:
+                state = await session.merge(state)  # keeps a newly registered external_id
+                source_events = await _apply_fetch(session, state, fetch, stats)
+                await record_changes(session, source_events)
+            committed(source_events)
+
+    # Write errors are raised only once every source has settled, so none is left running unawaited
+    results = await asyncio.gather(*(sync_source(p) for p in providers), return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    if len(fetch_errors) == len(providers):
+        raise fetch_errors[0]
+
+    # Sources dropped from OFFER_PROVIDERS: remove what they left behind
+    configured = {PRIMARY_SOURCE, *(p.name for p in settings.offer_providers)}
+    for source, state in states.items():
+        if source not in configured:
+            async with db_session() as session:
+                reconciler = OfferReconciler(session, product_id, source)
+                await reconciler.reconcile([])
+                await session.delete(await session.merge(state))
+                await record_changes(session, reconciler.events)
+            committed(reconciler.events)
+    return events
+
+
+# Scheduled and on-demand syncs of the same product share one upstream fetch
+sync_flight: SingleFlight[UUID, SyncStats] = SingleFlight()
+
+
+def _publish(events: list[OfferEvent]) -> None:
+    if snapshot.ready:
+        snapshot.apply(events)
+    bus.publish(events)
+
+
+async def _sync_and_publish(providers: list[OfferProvider], product_id: UUID, external_id: UUID) -> SyncStats:
+    stats = SyncStats(products=1)
+    await sync_product(providers, product_id, external_id, stats, publish=_publish)
+    return stats
+
+
+def start_product_sync(
+    providers: list[OfferProvider], product_id: UUID, external_id: UUID
+) -> "asyncio.Future[SyncStats]":
+    """Start syncing one product from the given providers, or join the sync already in flight for it."""
+    return sync_flight.start(product_id, lambda: _sync_and_publish(providers, product_id, external_id))
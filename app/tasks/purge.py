@@ -0,0 +1,74 @@
+"""Background purge of soft-deleted products."""
+
+import asyncio
+import logging
+import typing as t
+from uuid import UUID
+
+from sqlalchemy import CursorResult, delete, select
+
+from app.config import settings
+from app.db.database import db_session
+from app.db.models import Offer as OfferModel, OfferHistory, OfferPriceRange, Product as ProductModel
+
+log = logging.getLogger(__name__)
+
+_PRODUCTS_PER_RUN = 100
+
+
+async def _delete_in_batches(
+    model: type[OfferModel] | type[OfferHistory] | type[OfferPriceRange], product_id: UUID, batch_size: int
+) -> int:
+    """Delete a product's rows from `model`, one short transaction per batch."""
+    deleted = 0
+    while True:
+        batch = select(model.id).where(model.product_id == product_id).limit(batch_size)
+        async with db_session() as session:
+            result = t.cast(
+                CursorResult,
+                await session.execute(
+                    delete(model).where(model.id.in_(batch)).execution_options(synchronize_session=False)
+                ),
+            )
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+        await asyncio.sleep(0)  # let request handlers in between batches
+
+
+async def purge_deleted_products(batch_size: int | None = None) -> int:
+    """Hard-delete soft-deleted products. Returns the number of products purged.
+
+    Offers and history are removed in batches first, so no single statement holds
+    locks on more than `batch_size` rows; the product row (with whatever its FKs
+    still cascade to) goes last.
+    """
+    batch_size = batch_size or settings.purge_batch_size
+    try:
+        async with db_session() as session:
+            result = await session.scalars(
+                select(ProductModel.id).where(ProductModel.deleted_at.isnot(None)).limit(_PRODUCTS_PER_RUN)
+            )
+            product_ids = list(result)
+    except Exception:
+        log.exception("Database connection failed, skipping purge")
+        return 0
+
+    purged = 0
+    for product_id in product_ids:
+        try:
+            offers = await _delete_in_batches(OfferModel, product_id, batch_size)
+            history = await _delete_in_batches(OfferHistory, product_id, batch_size)
+            history += await _delete_in_batches(OfferPriceRange, product_id, batch_size)
+            async with db_session() as session:
+                await session.execute(
+                    delete(ProductModel).where(ProductModel.id == product_id, ProductModel.deleted_at.isnot(None))
+                )
+            purged += 1
+            log.debug("Purged product %s (%d offers, %d history rows)", product_id, offers, history)
+        except Exception:
+            log.exception("Failed to purge product %s", product_id)
+
+    if purged:
+        log.info("Purged %d soft-deleted products", purged)
+    return purged
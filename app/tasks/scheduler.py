@@ -1,65 +1,184 @@
 """Background task scheduler."""
 
+import asyncio
 import logging
+import time
+import typing as t
+from dataclasses import asdict
+from datetime import UTC, datetime
+from uuid import UUID, uuid4
 
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
-from sqlalchemy import select
+from sqlalchemy import Select, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
 from app.db.database import db_session
-from app.db.models import Product as ProductModel
-from app.services.offers_client import OffersClient
-from app.services.sync_service import OfferReconciler
+from app.db.models import Product as ProductModel, SyncCheckpoint
+from app.services.providers import OfferProvider, offer_providers
+from app.services.sync_service import SyncStats, start_product_sync, sync_flight
+from app.tasks.purge import purge_deleted_products
+
+if t.TYPE_CHECKING:
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    from apscheduler.triggers.cron import CronTrigger
 
 log = logging.getLogger(__name__)
 
-scheduler = AsyncIOScheduler()
+# Created by start_scheduler(), so processes with neither SYNC_SCHEDULE nor SOFT_DELETE set never import APScheduler
+scheduler: "AsyncIOScheduler | None" = None
 
+CHECKPOINT_JOB = "sync_offers"
+# Progress is saved after this many products or seconds, whichever comes first, rather than per product
+_CHECKPOINT_EVERY = 100
+_CHECKPOINT_INTERVAL = 10.0
+
+last_sync_stats: SyncStats | None = None
+
+# Set by stop_scheduler(): the running cycle finishes its current product and stops
+_stopping = False
+_current_cycle: "asyncio.Task | None" = None
+
+
+def registered_products_query(after: UUID | None = None) -> Select:
+    """Live products to sync in id order, answered from the ix_product_registered partial index.
+
+    `after` skips products up to and including that id, to resume an interrupted run.
+    """
+    query = select(ProductModel.id, ProductModel.external_id).where(
+        ProductModel.external_id.isnot(None), ProductModel.deleted_at.is_(None)
+    )
+    if after is not None:
+        query = query.where(ProductModel.id > after)
+    return query.order_by(ProductModel.id)
+
+
+async def _begin_run(session: AsyncSession) -> tuple[SyncCheckpoint, bool]:
+    """Return the unfinished run to resume, or start a new one. The flag tells which."""
+    checkpoint = await session.get(SyncCheckpoint, CHECKPOINT_JOB)
+    if checkpoint is not None and checkpoint.completed_at is None:
+        return checkpoint, True
+    if checkpoint is None:
+        checkpoint = SyncCheckpoint(job=CHECKPOINT_JOB)
+        session.add(checkpoint)
+    checkpoint.run_id = uuid4()
+    checkpoint.started_at = datetime.now(UTC)
+    checkpoint.last_product_id = None
+    checkpoint.completed_at = None
+    return checkpoint, False
 
-async def sync_all_offers() -> None:
-    """Sync offers for all registered products."""
-    log.info("Starting background offer sync")
 
-    # Fetch all registered products
+async def _save_checkpoint(run_id: UUID, **values) -> None:
+    """Record run progress; a lost write only means the products since the last save are synced again."""
     try:
         async with db_session() as session:
-            result = await session.execute(
-                select(ProductModel).where(ProductModel.external_id.isnot(None))
+            await session.execute(
+                update(SyncCheckpoint)
+                .where(SyncCheckpoint.job == CHECKPOINT_JOB, SyncCheckpoint.run_id == run_id)
+                .values(**values)
             )
-            products = result.scalars().all()
+    except Exception:
+        log.warning("Failed to save sync checkpoint for run %s", run_id, exc_info=True)
+
+
+async def _authenticated_providers() -> list[OfferProvider]:
+    """Authenticate all providers in parallel; one that fails sits out this cycle, its offers kept."""
+    providers = offer_providers()
+    results = await asyncio.gather(
+        *(asyncio.wait_for(p.client.ensure_authenticated(), p.timeout) for p in providers),
+        return_exceptions=True,
+    )
+    authenticated = []
+    for provider, result in zip(providers, results, strict=True):
+        if isinstance(result, BaseException):
+            log.error("Authentication with offers provider %s failed", provider.name, exc_info=result)
+        else:
+            authenticated.append(provider)
+    return authenticated
+
+
+async def sync_all_offers() -> SyncStats | None:
+    """Sync offers for all registered products, resuming an interrupted run where it stopped."""
+    global _current_cycle
+    _current_cycle = asyncio.current_task()
+    try:
+        return await _sync_cycle()
+    finally:
+        _current_cycle = None
+
+
+async def _sync_cycle() -> SyncStats | None:
+    global last_sync_stats
+    log.info("Starting background offer sync")
+
+    try:
+        async with db_session() as session:
+            checkpoint, resumed = await _begin_run(session)
+            run_id = checkpoint.run_id
+            result = await session.execute(registered_products_query(after=checkpoint.last_product_id))
+            products = result.all()
     except Exception:
         log.exception("Database connection failed, skipping sync cycle")
-        return
+        return None
+
+    if resumed:
+        log.info("Resuming sync run %s after product %s", run_id, checkpoint.last_product_id)
 
     if not products:
+        await _save_checkpoint(run_id, completed_at=datetime.now(UTC))
         log.info("No registered products to sync")
-        return
+        return None
 
     log.info("Syncing offers for %d products", len(products))
-    client = OffersClient.get()
-
-    try:
-        await client.ensure_authenticated()
-    except Exception:
-        log.exception("Authentication failed, skipping sync cycle")
-        return
+    providers = await _authenticated_providers()
+    if not providers:
+        log.error("No offers provider available, skipping sync cycle")
+        return None
 
+    stats = SyncStats()
+    last_product_id = checkpoint.last_product_id
+    unsaved, saved_at = 0, time.monotonic()  # products synced since the last checkpoint save
     for product in products:
+        if _stopping:
+            if unsaved:
+                await _save_checkpoint(run_id, last_product_id=last_product_id)
+            log.info("Shutting down, sync run %s will resume at product %s", run_id, product.id)
+            break
+        stats.products += 1
         try:
-            async with db_session() as session:
-                external_offers = await client.get_offers(product.external_id)  # type: ignore[arg-type]  # filtered by isnot(None)
-                reconciler = OfferReconciler(session, product.id)
-                await reconciler.reconcile(external_offers)
-            log.info("Synced offers for product %s", product.id)
+            # external_id is filtered by isnot(None)
+            sync = start_product_sync(providers, product.id, product.external_id)  # type: ignore[arg-type]
+            stats.add(await asyncio.shield(sync))
+            log.debug("Synced offers for product %s", product.id)
         except Exception:
+            stats.failed += 1
             log.exception("Failed to sync offers for product %s", product.id)
+        last_product_id, unsaved = product.id, unsaved + 1
+        if unsaved >= _CHECKPOINT_EVERY or time.monotonic() - saved_at >= _CHECKPOINT_INTERVAL:
+            await _save_checkpoint(run_id, last_product_id=last_product_id)
+            unsaved, saved_at = 0, time.monotonic()
+    else:
+        await _save_checkpoint(run_id, last_product_id=last_product_id, completed_at=datetime.now(UTC))
 
-    log.info("Background offer sync complete")
+    last_sync_stats = stats
+    log.info(
+        "Background offer sync complete: %d reconciled (%d offer changes), %d not modified, %d failed "
+        "(%d provider errors), %d bytes downloaded, %d bytes saved",
+        stats.reconciled,
+        stats.offer_changes,
+        stats.not_modified,
+        stats.failed,
+        stats.provider_errors,
+        stats.bytes_downloaded,
+        stats.bytes_saved,
+        extra={"sync_stats": asdict(stats)},
+    )
+    return stats
 
 
-def _parse_cron_expression(expr: str) -> CronTrigger:
+def _parse_cron_expression(expr: str) -> "CronTrigger":
     """Parse 6-field cron expression (sec min hour day month dow)."""
+    from apscheduler.triggers.cron import CronTrigger
+
     parts = expr.split()
     if len(parts) != 6:
         raise ValueError(f"Expected 6-field cron expression, got {len(parts)} fields")
@@ -74,23 +193,64 @@ def _parse_cron_expression(expr: str) -> CronTrigger:
 
 
 def start_scheduler() -> None:
-    """Start the background scheduler."""
-    if not settings.sync_schedule:
+    """Start the background scheduler: the offer sync if SYNC_SCHEDULE is set, the purge if SOFT_DELETE is."""
+    global scheduler
+    if not settings.sync_schedule and not settings.soft_delete:
         log.info("Scheduler disabled (no SYNC_SCHEDULE configured)")
         return
-    trigger = _parse_cron_expression(settings.sync_schedule)
-    scheduler.add_job(
-        sync_all_offers,
-        trigger,
-        id="sync_offers",
-        replace_existing=True,
-    )
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+    scheduler = AsyncIOScheduler()
+    if settings.sync_schedule:
+        scheduler.add_job(
+            sync_all_offers,
+            _parse_cron_expression(settings.sync_schedule),
+            id="sync_offers",
+            replace_existing=True,
+        )
+    else:
+        log.info("Offer sync disabled (no SYNC_SCHEDULE configured)")
+    if settings.soft_delete:
+        # Soft-deleted products must be purged even where no sync is scheduled
+        scheduler.add_job(
+            purge_deleted_products,
+            "interval",
+            seconds=settings.purge_interval_seconds,
+            id="purge_products",
+            replace_existing=True,
+        )
     scheduler.start()
-    log.info("Scheduler started (schedule: %s)", settings.sync_schedule)
+    log.info("Scheduler started (schedule: %s, purge: %s)", settings.sync_schedule or "none", settings.soft_delete)
 
 
-def stop_scheduler() -> None:
-    """Stop the background scheduler."""
-    if scheduler.running:
+async def stop_scheduler() -> None:
+    """Stop the background scheduler and drain a running sync cycle and product syncs.
+
+    The cycle finishes the product it is working on and stops; the rest of the run
+    resumes from the checkpoint on the next start. If that takes longer than
+    SYNC_DRAIN_TIMEOUT the cycle is cancelled, and the products since its last
+    checkpoint are redone. Product syncs still in flight (the cancelled cycle's
+    shielded one, or on-demand syncs) get what is left of the timeout and are then
+    cancelled, so none outlives the provider clients and the engine.
+    """
+    global _stopping, scheduler
+    if scheduler is not None and scheduler.running:
         scheduler.shutdown(wait=False)
+        scheduler = None
         log.info("Scheduler stopped")
+
+    deadline = time.monotonic() + settings.sync_drain_timeout
+    cycle = _current_cycle
+    if cycle is not None and not cycle.done():
+        _stopping = True
+        try:
+            _, pending = await asyncio.wait({cycle}, timeout=settings.sync_drain_timeout)
+            if pending:
+                log.warning("Sync cycle did not drain within %.0fs, cancelling it", settings.sync_drain_timeout)
+                cycle.cancel()
+                await asyncio.wait({cycle})
+        finally:
+            _stopping = False
+
+    if cancelled := await sync_flight.drain(timeout=max(0.0, deadline - time.monotonic())):
+        log.warning("Cancelled %d product syncs still in flight at shutdown", cancelled)
@@ -0,0 +1,142 @@
+"""Payload benchmark: bytes on the wire and latency per encoding across offer list sizes.
+
+Serves synthetic offer lists through the app's CompressionMiddleware and MessagePack
+negotiation (in-process, no database) and reports, for each size and encoding, the
+response size, server-side latency percentiles and the estimated transfer time over a
+link of the given bandwidth. brotli and MessagePack rows appear only when installed.
+
+Usage:
+    uv run python -m benchmarks.compression --sizes 10 100 1000 10000 --bandwidth-mbps 50 --rtt-ms 80
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import time
+from uuid import uuid4
+
+import httpx
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from app import compression, negotiation
+from app.compression import CompressionMiddleware
+from benchmarks.run import percentile
+
+
+def make_offers(count: int, rng: random.Random) -> list[dict]:
+    product_id = str(uuid4())
+    return [
+        {
+            "id": str(uuid4()),
+            "product_id": product_id,
+            "price": rng.randint(100, 100_000),
+            "items_in_stock": rng.randint(0, 50),
+        }
+        for _ in range(count)
+    ]
+
+
+def create_app(payloads: dict[int, list[dict]]) -> Starlette:
+    async def offers(request: Request) -> Response:
+        data = payloads[int(request.path_params["count"])]
+        if negotiation.wants_msgpack(request):
+            return negotiation.MsgPackResponse(data)
+        return JSONResponse(data)
+
+    return Starlette(routes=[Route("/offers/{count:int}", offers)])
+
+
+def encodings() -> list[tuple[str, dict[str, str]]]:
+    variants = [("json", {"Accept-Encoding": "identity"}), ("json+gzip", {"Accept-Encoding": "gzip"})]
+    if compression.brotli is not None:
+        variants.append(("json+br", {"Accept-Encoding": "br"}))
+    if negotiation.msgpack is not None:
+        msgpack = {"Accept": "application/msgpack"}
+        variants.append(("msgpack", msgpack | {"Accept-Encoding": "identity"}))
+        variants.append(("msgpack+gzip", msgpack | {"Accept-Encoding": "gzip"}))
+        if compression.brotli is not None:
+            variants.append(("msgpack+br", msgpack | {"Accept-Encoding": "br"}))
+    return variants
+
+
+async def measure(
+    client: httpx.AsyncClient, count: int, headers: dict[str, str], requests: int
+) -> tuple[int, list[float]]:
+    latencies = []
+    wire_bytes = 0
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await client.get(f"/offers/{count}", headers=headers)
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+        wire_bytes = response.num_bytes_downloaded
+    return wire_bytes, sorted(latencies)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    rng = random.Random(0)
+    payloads = {size: make_offers(size, rng) for size in args.sizes}
+    app = CompressionMiddleware(
+        create_app(payloads),
+        minimum_size=args.min_size,
+        gzip_level=args.gzip_level,
+        brotli_quality=args.brotli_quality,
+    )
+    bytes_per_ms = args.bandwidth_mbps * 1_000_000 / 8 / 1000
+
+    results = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for size in args.sizes:
+            baseline = None
+            for name, headers in encodings():
+                wire_bytes, latencies = await measure(client, size, headers, args.requests)
+                baseline = baseline or wire_bytes
+                server_p50 = percentile(latencies, 50) * 1000
+                results.append({
+                    "offers": size,
+                    "encoding": name,
+                    "bytes": wire_bytes,
+                    "ratio": round(wire_bytes / baseline, 3),
+                    "p50_ms": round(server_p50, 3),
+                    "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+                    "est_total_ms": round(server_p50 + args.rtt_ms + wire_bytes / bytes_per_ms, 2),
+                })
+
+    return {
+        "python": platform.python_version(),
+        "config": vars(args),
+        "brotli": compression.brotli is not None,
+        "msgpack": negotiation.msgpack is not None,
+        "results": results,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000], help="offers per response")
+    parser.add_argument("--requests", type=int, default=50, help="requests per size and encoding")
+    parser.add_argument("--min-size", type=int, default=1024, help="compression threshold in bytes")
+    parser.add_argument("--gzip-level", type=int, default=5)
+    parser.add_argument("--brotli-quality", type=int, default=4)
+    parser.add_argument("--bandwidth-mbps", type=float, default=50.0, help="link bandwidth for the transfer estimate")
+    parser.add_argument("--rtt-ms", type=float, default=80.0, help="round-trip time added to the estimate")
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    rendered = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(rendered + "\n")
+    else:
+        sys.stdout.write(rendered + "\n")
+
+
+if __name__ == "__main__":
+    main()
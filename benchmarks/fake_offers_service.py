@@ -0,0 +1,93 @@
+"""Configurable local stand-in for the external offers service."""
+
+import asyncio
+import hashlib
+import json
+import random
+from dataclasses import dataclass, field
+from uuid import UUID, uuid4, uuid5
+
+from fastapi import FastAPI, HTTPException, Header, Response
+
+
+@dataclass
+class FakeOffersConfig:
+    latency_ms: float = 0.0  # added to every offers/register call
+    error_rate: float = 0.0  # fraction of offers calls answered with 500
+    offers_per_product: int = 10
+    change_rate: float = 0.1  # fraction of offers whose price changes between fetches
+    seed: int = 0
+    name: str = ""  # prefixes offer ids, so several fake providers report distinct offers
+
+
+@dataclass
+class FakeOffersState:
+    config: FakeOffersConfig
+    rng: random.Random = field(init=False)
+    offers: dict[UUID, list[dict]] = field(default_factory=dict)
+    calls: int = 0
+    errors: int = 0
+    not_modified: int = 0
+
+    def __post_init__(self) -> None:
+        self.rng = random.Random(self.config.seed)
+
+    def offers_for(self, product_id: UUID) -> list[dict]:
+        offers = self.offers.get(product_id)
+        if offers is None:
+            offers = [
+                {
+                    "id": str(uuid5(product_id, f"{self.config.name}{i}")),
+                    "price": self.rng.randint(100, 100_000),
+                    "items_in_stock": self.rng.randint(0, 50),
+                }
+                for i in range(self.config.offers_per_product)
+            ]
+            self.offers[product_id] = offers
+            return offers
+        for offer in offers:
+            if self.rng.random() < self.config.change_rate:
+                offer["price"] = self.rng.randint(100, 100_000)
+        return offers
+
+
+def _etag(offers: list[dict]) -> str:
+    digest = hashlib.blake2b(repr(offers).encode(), digest_size=8).hexdigest()
+    return f'"{digest}"'
+
+
+def create_app(config: FakeOffersConfig | None = None) -> FastAPI:
+    """Build the fake service. Its counters are exposed on `app.state.fake`."""
+    state = FakeOffersState(config or FakeOffersConfig())
+    app = FastAPI(title="Fake offers service")
+    app.state.fake = state
+
+    async def _delay() -> None:
+        if state.config.latency_ms:
+            await asyncio.sleep(state.config.latency_ms / 1000)
+
+    @app.post("/api/v1/auth", status_code=201)
+    async def auth():
+        return {"access_token": uuid4().hex}
+
+    @app.post("/api/v1/products/register", status_code=201)
+    async def register(payload: dict):
+        await _delay()
+        return {"id": payload["id"]}
+
+    @app.get("/api/v1/products/{product_id}/offers")
+    async def offers(product_id: UUID, if_none_match: str | None = Header(None)):
+        state.calls += 1
+        await _delay()
+        if state.rng.random() < state.config.error_rate:
+            state.errors += 1
+            raise HTTPException(status_code=500, detail="Injected failure")
+
+        body = state.offers_for(product_id)
+        etag = _etag(body)
+        if if_none_match == etag:
+            state.not_modified += 1
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(content=json.dumps(body), media_type="application/json", headers={"ETag": etag})
+
+    return app
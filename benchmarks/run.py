@@ -0,0 +1,240 @@
+"""Throughput benchmark: sync cycles and API latency against a local fake offers service.
+
+Runs entirely in-process (ASGI transports, no sockets), so numbers reflect the
+application and database, not the network. Use a scratch database: the run
+creates tables and seeds products.
+
+With `--providers N` the sync fans out to N fake services per product (the main
+one plus N-1 extra providers), to measure the cost of parallel multi-source sync.
+
+Usage:
+    uv run python -m benchmarks.run --products 500 --concurrency 32 --output bench.json
+    uv run python -m benchmarks.run --providers 3 --latency-ms 20
+"""
+
+import os
+
+# Settings are read at import time; provide placeholders so the bench runs without a .env
+os.environ.setdefault("OFFERS_SERVICE_URL", "http://fake-offers")
+os.environ.setdefault("OFFERS_REFRESH_TOKEN", "bench")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import typing as t
+from dataclasses import replace
+from datetime import UTC, datetime
+from uuid import UUID, uuid4
+
+import httpx
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.config import OfferProviderSettings, settings
+from app.db import database
+from app.db.models import Base, Offer, Product
+from app.services import offers_client, providers
+from app.services.offers_client import OffersClient
+from benchmarks.fake_offers_service import FakeOffersConfig, create_app
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[idx]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "requests": len(values) + errors,
+        "errors": errors,
+        "rps": round((len(values) + errors) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+    }
+
+
+async def load(
+    client: httpx.AsyncClient,
+    make_request: t.Callable[[httpx.AsyncClient], t.Awaitable[httpx.Response]],
+    requests: int,
+    concurrency: int,
+) -> dict:
+    """Fire `requests` calls from `concurrency` workers and report latency percentiles."""
+    latencies: list[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await make_request(client)
+            if response.status_code >= 400:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def seed_products(count: int) -> list[UUID]:
+    """Insert registered products directly, bypassing the upstream registration."""
+    if database.session_factory is None:
+        raise RuntimeError("Database is not initialised")
+    ids = [uuid4() for _ in range(count)]
+    async with database.db_session() as session:
+        session.add_all(Product(id=pid, name=f"bench-{pid.hex[:8]}", external_id=pid) for pid in ids)
+    return ids
+
+
+async def bench_sync(cycles: int, offers_per_product: int) -> list[dict]:
+    from app.tasks.scheduler import sync_all_offers
+
+    results = []
+    for cycle in range(cycles):
+        start = time.perf_counter()
+        stats = await sync_all_offers()
+        elapsed = time.perf_counter() - start
+        if stats is None:
+            raise RuntimeError("Sync cycle did not run, check database and fake service setup")
+        rows = stats.reconciled * offers_per_product
+        results.append({
+            "cycle": cycle,
+            "seconds": round(elapsed, 4),
+            "products": stats.products,
+            "reconciled": stats.reconciled,
+            "not_modified": stats.not_modified,
+            "failed": stats.failed,
+            "provider_errors": stats.provider_errors,
+            "reconcile_rows_per_sec": round(rows / elapsed, 1) if elapsed else 0.0,
+            "bytes_downloaded": stats.bytes_downloaded,
+            "bytes_saved": stats.bytes_saved,
+        })
+    return results
+
+
+async def bench_api(product_ids: list[UUID], requests: int, concurrency: int) -> dict:
+    from app.main import app
+
+    rng = random.Random(0)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        return {
+            "GET /products": await load(client, lambda c: c.get("/products"), requests, concurrency),
+            "GET /products/{id}/offers": await load(
+                client,
+                lambda c: c.get(f"/products/{rng.choice(product_ids)}/offers"),
+                requests,
+                concurrency,
+            ),
+            "POST /products": await load(
+                client,
+                lambda c: c.post("/products", json={"name": "bench", "description": "load test"}),
+                requests,
+                concurrency,
+            ),
+        }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    database_url = args.database_url or f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db"
+    engine = create_async_engine(database_url)
+    database.enable_sqlite_foreign_keys(engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    database.engine = engine
+    database.session_factory = database.make_session_factory(engine)
+
+    fake_config = FakeOffersConfig(
+        latency_ms=args.latency_ms,
+        error_rate=args.error_rate,
+        offers_per_product=args.offers_per_product,
+        change_rate=args.change_rate,
+    )
+    fake_app = create_app(fake_config)
+    offers_client._instance = OffersClient(transport=httpx.ASGITransport(app=fake_app))
+    extra_apps = {}
+    settings.offer_providers = [
+        OfferProviderSettings(
+            name=f"fake-{i}",
+            url=f"http://fake-offers-{i}",
+            refresh_token="bench",  # noqa: S106 - the fake services accept any token
+        )
+        for i in range(1, args.providers)
+    ]
+    for i, config in enumerate(settings.offer_providers, start=1):
+        extra_apps[config.name] = create_app(replace(fake_config, name=config.name, seed=i))
+        providers._extra_clients[config.name] = OffersClient(
+            transport=httpx.ASGITransport(app=extra_apps[config.name]), provider=config
+        )
+
+    try:
+        product_ids = await seed_products(args.products)
+        sync = await bench_sync(args.cycles, args.offers_per_product)
+        api = await bench_api(product_ids, args.requests, args.concurrency)
+        async with database.db_session() as session:
+            offer_rows = await session.scalar(select(func.count()).select_from(Offer))
+    finally:
+        await providers.close_providers()
+        await engine.dispose()
+
+    return {
+        "timestamp": datetime.now(UTC).isoformat(),
+        "python": platform.python_version(),
+        "database": engine.dialect.name,
+        "config": vars(args) | {"database_url": engine.url.render_as_string(hide_password=True)},
+        "offer_rows": offer_rows,
+        "fake_service": {
+            "calls": fake_app.state.fake.calls,
+            "errors": fake_app.state.fake.errors,
+            "not_modified": fake_app.state.fake.not_modified,
+        },
+        "extra_providers": {
+            name: {"calls": extra.state.fake.calls, "errors": extra.state.fake.errors}
+            for name, extra in extra_apps.items()
+        },
+        "provider_metrics": providers.provider_stats(),
+        "sync": sync,
+        "api": api,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=200, help="products to seed")
+    parser.add_argument("--offers-per-product", type=int, default=20)
+    parser.add_argument("--cycles", type=int, default=2, help="sync cycles to run (first one is cold)")
+    parser.add_argument("--change-rate", type=float, default=0.1, help="fraction of offers repriced per fetch")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="fake upstream latency per call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream calls failing with 500")
+    parser.add_argument("--providers", type=int, default=1, help="offer providers per product, each a fake service")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per API endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    rendered = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(rendered + "\n")
+    else:
+        sys.stdout.write(rendered + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Startup benchmark: cold import, lifespan start and migration check, each in a fresh interpreter.
+
+Every measurement runs in a new subprocess against a scratch SQLite database, so
+results include interpreter start and module loading exactly as a new container
+would pay them. Also reports a `-X importtime` breakdown of `import app.main` by
+top-level package.
+
+Usage:
+    uv run python -m benchmarks.startup --runs 5 --output startup.json
+"""
+
+import os
+
+# Settings are read at import time; provide placeholders so the bench runs without a .env
+os.environ.setdefault("OFFERS_SERVICE_URL", "http://fake-offers")
+os.environ.setdefault("OFFERS_REFRESH_TOKEN", "bench")
+
+import argparse
+import json
+import platform
+import re
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from app.migrate import script_heads, versions_dir
+
+ROOT = Path(__file__).resolve().parent.parent
+
+_LIFESPAN_SCRIPT = """
+import asyncio, json, time
+start = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+async def main():
+    async with app.router.lifespan_context(app):
+        return time.perf_counter()
+
+ready = asyncio.run(main())
+print(json.dumps({"import_ms": (imported - start) * 1000, "lifespan_ms": (ready - imported) * 1000}))
+"""
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def run_timed(args: list[str], env: dict[str, str]) -> tuple[float, str]:
+    start = time.perf_counter()
+    # Only ever runs this interpreter on the fixed scripts above, no outside input
+    proc = subprocess.run(args, env=env, cwd=ROOT, capture_output=True, text=True, check=True)  # noqa: S603
+    return (time.perf_counter() - start) * 1000, proc.stdout
+
+
+def median_ms(samples: list[float]) -> float:
+    return round(statistics.median(samples), 1)
+
+
+def bench_lifespan(env: dict[str, str], runs: int) -> dict:
+    wall, imports, lifespans = [], [], []
+    for _ in range(runs):
+        elapsed, out = run_timed([sys.executable, "-c", _LIFESPAN_SCRIPT], env)
+        timings = json.loads(out.strip().splitlines()[-1])
+        wall.append(elapsed)
+        imports.append(timings["import_ms"])
+        lifespans.append(timings["lifespan_ms"])
+    return {"process_ms": median_ms(wall), "import_ms": median_ms(imports), "lifespan_ms": median_ms(lifespans)}
+
+
+def bench_migrations(env: dict[str, str], runs: int) -> dict:
+    fast = [run_timed([sys.executable, "-m", "app.migrate"], env)[0] for _ in range(runs)]
+    alembic = [run_timed([sys.executable, "-m", "alembic", "upgrade", "head"], env)[0] for _ in range(runs)]
+    return {"app.migrate_ms": median_ms(fast), "alembic_upgrade_ms": median_ms(alembic)}
+
+
+def import_breakdown(env: dict[str, str], top: int) -> dict:
+    """Self time of every module imported by `import app.main`, summed per top-level package."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=env,
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    per_package: Counter[str] = Counter()
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            per_package[match.group(4).split(".")[0]] += int(match.group(1))
+    total = sum(per_package.values())
+    return {
+        "total_ms": round(total / 1000, 1),
+        "packages_ms": {name: round(us / 1000, 1) for name, us in per_package.most_common(top)},
+    }
+
+
+def stamp_head(db_path: Path) -> None:
+    """Record the current head in a scratch database so the migration check has nothing to do."""
+    (head,) = script_heads(versions_dir(str(ROOT / "alembic.ini")))
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE alembic_version (version_num VARCHAR(32) PRIMARY KEY)")
+        conn.execute("INSERT INTO alembic_version VALUES (?)", (head,))
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per measurement (median reported)")
+    parser.add_argument("--top", type=int, default=15, help="packages listed in the import breakdown")
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    db_path = Path(tempfile.mkdtemp()) / "startup.db"
+    stamp_head(db_path)
+    env = os.environ | {
+        "DATABASE_URL": f"sqlite+aiosqlite:///{db_path}",
+        "LOG_LEVEL": "WARNING",
+    }
+
+    results = {
+        "python": platform.python_version(),
+        "config": vars(args),
+        "api_only": bench_lifespan(env | {"SYNC_SCHEDULE": ""}, args.runs),
+        "with_scheduler": bench_lifespan(env | {"SYNC_SCHEDULE": "0 0 0 * * *"}, args.runs),
+        "migrations_at_head": bench_migrations(env, args.runs),
+        "imports": import_breakdown(env, args.top),
+    }
+    rendered = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(rendered + "\n")
+    else:
+        sys.stdout.write(rendered + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
 #!/bin/sh
 set -e
 
-echo "Running database migrations..."
-alembic upgrade head
+echo "Checking database migrations..."
+python -m app.migrate
 echo "Migrations complete. Starting application..."
 
-exec "$@"
\ No newline at end of file
+exec "$@"
@@ -1,12 +1,15 @@
+import asyncio
 from unittest.mock import AsyncMock, patch
-from uuid import uuid4
+from uuid import UUID, uuid4
 
 import httpx
 import pytest
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 
-from app.db.database import make_session_factory
+from app.db.database import enable_sqlite_foreign_keys, make_session_factory
 from app.db.models import Base
+from app.schemas import ExternalOffer
+from app.services.offers_client import OffersFetch
 
 TEST_DATABASE_URL = "sqlite+aiosqlite://"
 
@@ -14,6 +17,7 @@ TEST_DATABASE_URL = "sqlite+aiosqlite://"
 @pytest.fixture()
 async def engine():
     eng = create_async_engine(TEST_DATABASE_URL)
+    enable_sqlite_foreign_keys(eng)
     async with eng.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     yield eng
@@ -33,11 +37,58 @@ async def session(test_session_factory) -> AsyncSession:
         yield sesh
 
 
+@pytest.fixture()
+def db(test_session_factory):
+    """Point the app's own sessions (`db_session`, `read_session`) at the test database."""
+    with patch("app.db.database.session_factory", test_session_factory):
+        yield
+
+
+class StubOffersClient:
+    """Stands in for an OffersClient: serves fixed offers and records registrations and fetches.
+
+    It can hang or fail every fetch, or pause on one upstream product id until released.
+    """
+
+    def __init__(
+        self,
+        offers: list[ExternalOffer] | None = None,
+        hang: bool = False,
+        fail: bool = False,
+        pause_on: UUID | None = None,
+    ) -> None:
+        self.offers = offers or []
+        self.hang = hang
+        self.fail = fail
+        self.pause_on = pause_on
+        self.paused = asyncio.Event()
+        self.release = asyncio.Event()
+        self.registered: list[UUID] = []
+        self.fetched: list[UUID] = []
+
+    async def ensure_authenticated(self) -> None:
+        pass
+
+    async def register_product(self, product_id: UUID, name: str, description: str | None) -> UUID:
+        self.registered.append(product_id)
+        return uuid4()
+
+    async def fetch_offers(self, external_id: UUID, etag=None, last_modified=None) -> OffersFetch:
+        self.fetched.append(external_id)
+        if self.hang:
+            await asyncio.Event().wait()
+        if external_id == self.pause_on:
+            self.paused.set()
+            await self.release.wait()
+        if self.fail:
+            raise RuntimeError("provider down")
+        return OffersFetch(offers=self.offers, etag='"1"', content_length=10)
+
+
 @pytest.fixture()
 async def mock_offers_client():
     mock = AsyncMock()
     mock.register_product = AsyncMock(return_value=uuid4())
-    mock.get_offers = AsyncMock(return_value=[])
     with patch("app.services.offers_client.OffersClient.get", return_value=mock):
         yield mock
 
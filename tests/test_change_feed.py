@@ -0,0 +1,83 @@
+"""Tests for the cross-process offer change feed."""
+
+from datetime import UTC, datetime, timedelta
+from unittest.mock import patch
+from uuid import uuid4
+
+from sqlalchemy import select
+
+from app.config import PRIMARY_SOURCE, settings
+from app.db.models import OfferChange, Product
+from app.schemas import ExternalOffer
+from app.services import change_feed
+from app.services.change_feed import ChangeFeedListener, PROCESS_ID
+from app.services.events import OfferEventKind, bus
+from app.services.providers import OfferProvider
+from app.services.sync_service import SyncStats, sync_product
+from tests.conftest import StubOffersClient
+
+
+def _change(origin=None, **values) -> OfferChange:
+    return OfferChange(
+        product_id=uuid4(),
+        offer_id=uuid4(),
+        kind=OfferEventKind.ADDED.value,
+        new_price=100,
+        new_stock=1,
+        origin=origin or uuid4(),
+        created_at=datetime.now(UTC),
+        **values,
+    )
+
+
+async def test_sync_writes_its_changes_to_the_feed(db, session, monkeypatch):
+    monkeypatch.setattr(settings, "change_feed", True)
+    product = Product(name="Widget", external_id=uuid4())
+    session.add(product)
+    await session.commit()
+    offer = ExternalOffer(id=uuid4(), price=100, items_in_stock=1)
+    providers = [OfferProvider(PRIMARY_SOURCE, StubOffersClient([offer]), timeout=1)]
+
+    await sync_product(providers, product.id, product.external_id, SyncStats())
+
+    [row] = (await session.scalars(select(OfferChange))).all()
+    assert (row.product_id, row.offer_id, row.kind, row.origin) == (product.id, offer.id, "added", PROCESS_ID)
+
+
+async def test_listener_publishes_only_other_processes_changes(db, session):
+    listener = ChangeFeedListener()
+    foreign, own = _change(), _change(origin=PROCESS_ID)
+    session.add_all([foreign, own])
+    await session.commit()
+    sub = bus.subscribe({foreign.product_id, own.product_id})
+    try:
+        events = await listener.poll()
+        assert [e.offer_id for e in events] == [foreign.offer_id]
+        assert [e.offer_id for e in await sub.get()] == [foreign.offer_id]
+        assert listener.cursor == own.id
+        assert await listener.poll() == []
+    finally:
+        bus.unsubscribe(sub)
+
+
+async def test_listener_waits_for_missing_ids_before_skipping_them(db, session):
+    listener = ChangeFeedListener()
+    session.add_all([_change(id=1), _change(id=3)])
+    await session.commit()
+
+    assert len(await listener.poll()) == 1  # id 2 may still be committing
+    assert listener.cursor == 1
+    with patch.object(change_feed, "_GAP_TIMEOUT", 0):
+        assert len(await listener.poll()) == 1
+    assert listener.cursor == 3
+
+
+async def test_prune_removes_rows_past_retention(db, session):
+    session.add_all([_change(), _change()])
+    await session.flush()
+    old = _change()
+    old.created_at = datetime.now(UTC) - timedelta(seconds=settings.change_feed_retention_seconds + 1)
+    session.add(old)
+    await session.commit()
+
+    assert await ChangeFeedListener().prune() == 1
@@ -0,0 +1,183 @@
+"""Tests for response compression and MessagePack negotiation."""
+
+import gzip
+import threading
+from uuid import uuid4
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from app import negotiation
+from app.compression import CompressionMiddleware, _THREAD_MIN_SIZE, choose_encoding
+from app.db.models import Offer, Product
+
+
+async def _seed_products(session, count: int) -> None:
+    session.add_all(Product(name=f"Product {i}", description="x" * 50) for i in range(count))
+    await session.commit()
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("deflate") is None
+    assert choose_encoding("gzip;q=0") is None
+    assert choose_encoding("*") is not None
+    assert choose_encoding("") is None
+
+
+def test_brotli_preferred_when_installed():
+    brotli = pytest.importorskip("brotli")
+    assert choose_encoding("gzip, br") == "br"
+    assert choose_encoding("gzip, br;q=0") == "gzip"
+    assert brotli.decompress(CompressionMiddleware(None).compress(b"abc" * 100, "br")) == b"abc" * 100
+
+
+async def test_large_list_is_gzipped(client, session):
+    await _seed_products(session, 30)
+
+    response = await client.get("/products", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert len(response.json()) == 30
+
+
+async def test_small_or_unaccepted_responses_are_not_compressed(client, session):
+    small = await client.get("/products", headers={"Accept-Encoding": "gzip"})
+    assert small.json() == []
+    assert "content-encoding" not in small.headers
+
+    await _seed_products(session, 30)
+    identity = await client.get("/products", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+
+
+async def test_event_streams_are_not_compressed():
+    async def events():
+        yield b"data: " + b"x" * 4096 + b"\n\n"
+        yield b"data: done\n\n"
+
+    async def stream(request):
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def big_json(request):
+        return JSONResponse({"data": "y" * 4096})
+
+    app = CompressionMiddleware(Starlette(routes=[Route("/stream", stream), Route("/json", big_json)]))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+        streamed = await c.get("/stream", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in streamed.headers
+        assert streamed.text.endswith("data: done\n\n")
+
+        compressed = await c.get("/json", headers={"Accept-Encoding": "gzip"})
+        assert compressed.headers["content-encoding"] == "gzip"
+
+    middleware = CompressionMiddleware(app, gzip_level=9)
+    assert gzip.decompress(middleware.compress(b"abc" * 100, "gzip")) == b"abc" * 100
+
+
+async def test_streamed_response_headers_are_not_held_back():
+    sent = []
+
+    async def app(scope, receive, send):
+        for content_type in (b"text/event-stream", b"application/json"):  # no Content-Length: streamed
+            sent.clear()
+            await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", content_type)]})
+            assert [m["type"] for m in sent] == ["http.response.start"]  # before any body exists
+            await send({"type": "http.response.body", "body": b"x" * 4096, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+            assert [m.get("body") for m in sent[1:]] == [b"x" * 4096, b""]
+
+    async def record(message):
+        sent.append(message)
+
+    await CompressionMiddleware(app)({"type": "http", "headers": [(b"accept-encoding", b"gzip")]}, None, record)
+    assert len(sent) == 3
+
+
+async def test_large_bodies_are_compressed_off_the_event_loop(monkeypatch):
+    threads = []
+
+    async def app(scope, receive, send):
+        body = b"x" * scope["size"]
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    middleware = CompressionMiddleware(app)
+    compress = middleware.compress
+
+    def compress_recording_thread(body, encoding):
+        threads.append(threading.current_thread())
+        return compress(body, encoding)
+
+    async def record(message):
+        sent.append(message)
+
+    monkeypatch.setattr(middleware, "compress", compress_recording_thread)
+    for size in (2048, _THREAD_MIN_SIZE):
+        sent = []
+        await middleware({"type": "http", "size": size, "headers": [(b"accept-encoding", b"gzip")]}, None, record)
+        assert gzip.decompress(sent[1]["body"]) == b"x" * size
+
+    assert threads[0] is threading.main_thread()
+    assert threads[1] is not threading.main_thread()
+
+
+async def test_compressed_offers_get_their_own_etag(client, session):
+    product = Product(name="Widget")
+    session.add(product)
+    await session.flush()
+    session.add_all(Offer(id=uuid4(), product_id=product.id, price=i, items_in_stock=1) for i in range(30))
+    await session.commit()
+    url = f"/products/{product.id}/offers"
+
+    identity = await client.get(url, headers={"Accept-Encoding": "identity"})
+    gzipped = await client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.headers["etag"] == identity.headers["etag"][:-1] + '-gzip"'
+
+    revalidated = await client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": gzipped.headers["etag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == gzipped.headers["etag"]
+    plain = await client.get(url, headers={"Accept-Encoding": "identity", "If-None-Match": identity.headers["etag"]})
+    assert (plain.status_code, plain.headers["etag"]) == (304, identity.headers["etag"])
+
+
+async def test_msgpack_falls_back_to_json_when_not_installed(client, session, monkeypatch):
+    monkeypatch.setattr(negotiation, "msgpack", None)
+    await _seed_products(session, 2)
+
+    response = await client.get("/products", headers={"Accept": "application/msgpack"})
+    assert response.headers["content-type"] == "application/json"
+    assert len(response.json()) == 2
+    assert "Accept" in response.headers["vary"]
+
+
+async def test_offers_msgpack_negotiation(client, session):
+    msgpack = pytest.importorskip("msgpack")
+    product = Product(name="Widget")
+    session.add(product)
+    await session.flush()
+    offer_id = uuid4()
+    session.add(Offer(id=offer_id, product_id=product.id, price=1000, items_in_stock=5))
+    await session.commit()
+
+    packed = await client.get(f"/products/{product.id}/offers", headers={"Accept": "application/msgpack"})
+    assert packed.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(packed.content) == [
+        {"id": str(offer_id), "product_id": str(product.id), "price": 1000, "items_in_stock": 5}
+    ]
+
+    as_json = await client.get(f"/products/{product.id}/offers")
+    assert as_json.headers["etag"] != packed.headers["etag"]
+    assert packed.headers["cache-control"] == as_json.headers["cache-control"]
+
+    preferred_json = await client.get(
+        f"/products/{product.id}/offers", headers={"Accept": "application/json, application/msgpack;q=0.5"}
+    )
+    assert preferred_json.headers["content-type"] == "application/json"
@@ -0,0 +1,104 @@
+"""Tests for the offer event bus and SSE stream."""
+
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+from app.config import settings
+from app.routers.stream import event_stream, stream_offer_changes
+from app.services.events import OfferEvent, OfferEventBus, OfferEventKind, SubscriptionDroppedError
+
+
+def _updated(product_id, offer_id, old, new):
+    return OfferEvent(
+        OfferEventKind.UPDATED, product_id, offer_id, old_price=old, new_price=new, old_stock=1, new_stock=1
+    )
+
+
+async def test_publish_only_reaches_subscribed_products():
+    bus = OfferEventBus()
+    wanted, other = uuid4(), uuid4()
+    sub = bus.subscribe({wanted})
+
+    bus.publish([
+        OfferEvent(OfferEventKind.ADDED, other, uuid4(), new_price=1, new_stock=1),
+        OfferEvent(OfferEventKind.ADDED, wanted, uuid4(), new_price=2, new_stock=1),
+    ])
+
+    batch = await sub.get()
+    assert [e.product_id for e in batch] == [wanted]
+
+
+async def test_coalesces_updates_to_same_offer():
+    bus = OfferEventBus()
+    product_id, offer_id = uuid4(), uuid4()
+    sub = bus.subscribe({product_id})
+
+    bus.publish([_updated(product_id, offer_id, 100, 200), _updated(product_id, offer_id, 200, 300)])
+
+    [event] = await sub.get()
+    assert event.old_price == 100
+    assert event.new_price == 300
+
+
+async def test_added_then_removed_cancels_out():
+    bus = OfferEventBus()
+    product_id, offer_id = uuid4(), uuid4()
+    sub = bus.subscribe({product_id})
+
+    bus.publish([
+        OfferEvent(OfferEventKind.ADDED, product_id, offer_id, new_price=1, new_stock=1),
+        OfferEvent(OfferEventKind.REMOVED, product_id, offer_id, old_price=1, old_stock=1),
+    ])
+
+    assert sub._pending == {}
+
+
+async def test_slow_subscriber_is_dropped():
+    bus = OfferEventBus()
+    product_id = uuid4()
+    sub = bus.subscribe({product_id}, max_pending=2)
+
+    bus.publish([_updated(product_id, uuid4(), 1, 2) for _ in range(3)])
+
+    assert sub.dropped
+    with pytest.raises(SubscriptionDroppedError):
+        await sub.get()
+
+
+class _Request:
+    async def is_disconnected(self) -> bool:
+        return False
+
+
+async def test_event_stream_renders_sse_and_unsubscribes(monkeypatch):
+    bus = OfferEventBus()
+    monkeypatch.setattr("app.routers.stream.bus", bus)
+    monkeypatch.setattr(settings, "stream_queue_size", 1)
+    product_id = uuid4()
+
+    stream = event_stream(_Request(), {product_id})
+    first = asyncio.ensure_future(anext(stream))
+    await asyncio.sleep(0)  # subscribed, waiting for events
+    bus.publish([_updated(product_id, uuid4(), 1, 2)])
+    message = await first
+    assert message.startswith("event: offer\ndata: ")
+    assert '"new_price": 2' in message
+
+    bus.publish([_updated(product_id, uuid4(), 1, 2), _updated(product_id, uuid4(), 1, 2)])
+    assert await anext(stream) == "event: dropped\ndata: {}\n\n"
+    with pytest.raises(StopAsyncIteration):
+        await anext(stream)
+    assert bus._subscribers == {}
+
+
+async def test_stream_subscribes_only_once_the_body_is_iterated(monkeypatch):
+    bus = OfferEventBus()
+    monkeypatch.setattr("app.routers.stream.bus", bus)
+
+    # The client may be gone before Starlette ever touches the body iterator
+    response = await stream_offer_changes(_Request(), [uuid4()])
+    assert bus._subscribers == {}
+    await response.body_iterator.aclose()
+    assert bus._subscribers == {}
@@ -0,0 +1,56 @@
+"""EXPLAIN-based checks that hot queries hit the intended indexes."""
+
+from uuid import uuid4
+
+from sqlalchemy import Select, text
+
+from app.db.models import Offer, Product
+from app.routers.offers import offers_query
+from app.services.sync_service import existing_offers_query
+from app.tasks.scheduler import registered_products_query
+
+
+async def _query_plan(session, stmt: Select) -> str:
+    conn = await session.connection()
+    sql = stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+    rows = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")
+    return " | ".join(row[-1] for row in rows)
+
+
+async def test_reconcile_load_uses_product_price_index(session):
+    plan = await _query_plan(session, existing_offers_query(uuid4()))
+    assert "USING INDEX ix_offer_product_id_price" in plan
+
+
+async def test_offers_query_avoids_sort(session):
+    plan = await _query_plan(session, offers_query(uuid4()))
+    assert "ix_offer_product_id_price" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+async def test_in_stock_offers_use_partial_index(session):
+    # The planner prefers the partial index once statistics show most offers are sold out
+    product = Product(name="Widget")
+    session.add(product)
+    await session.flush()
+    session.add_all(
+        Offer(id=uuid4(), product_id=product.id, price=i, items_in_stock=int(i % 20 == 0)) for i in range(200)
+    )
+    await session.flush()
+    await session.execute(text("ANALYZE"))
+
+    plan = await _query_plan(session, offers_query(product.id, in_stock=True))
+    assert "USING INDEX ix_offer_in_stock" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+async def test_sync_scan_uses_registered_index(session):
+    plan = await _query_plan(session, registered_products_query())
+    assert "USING INDEX ix_product_registered" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+async def test_resumed_sync_scan_seeks_into_registered_index(session):
+    plan = await _query_plan(session, registered_products_query(after=uuid4()))
+    assert "USING INDEX ix_product_registered (id>?)" in plan
+    assert "TEMP B-TREE" not in plan
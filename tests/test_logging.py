@@ -0,0 +1,57 @@
+"""Tests for structured and sampled logging."""
+
+import json
+import logging
+import queue
+
+from app.logging_setup import DeferredQueueHandler, JsonFormatter, SamplingFilter
+
+
+def _record(name: str, level: int = logging.INFO, msg: str = "hello %s", args=("world",)) -> logging.LogRecord:
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_json_formatter_includes_extra_fields():
+    record = _record("app.tasks.scheduler")
+    record.sync_stats = {"reconciled": 3}
+
+    payload = json.loads(JsonFormatter().format(record))
+
+    assert payload["message"] == "hello world"
+    assert payload["level"] == "INFO"
+    assert payload["logger"] == "app.tasks.scheduler"
+    assert payload["sync_stats"] == {"reconciled": 3}
+
+
+def test_sampling_keeps_one_in_n_info_records():
+    sampler = SamplingFilter({"app.routers": 0.25})
+
+    kept = sum(sampler.filter(_record("app.routers.offers")) for _ in range(100))
+
+    assert kept == 25
+
+
+def test_sampling_never_drops_warnings_or_unconfigured_loggers():
+    sampler = SamplingFilter({"app.routers": 0.0})
+
+    assert not sampler.filter(_record("app.routers.products"))
+    assert sampler.filter(_record("app.routers.products", level=logging.WARNING))
+    assert sampler.filter(_record("app.tasks.scheduler"))
+
+
+def test_sampling_prefers_longest_prefix():
+    sampler = SamplingFilter({"app": 0.0, "app.tasks": 1.0})
+
+    assert sampler.filter(_record("app.tasks.scheduler"))
+    assert not sampler.filter(_record("app.routers.offers"))
+
+
+def test_queue_handler_defers_formatting():
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = DeferredQueueHandler(log_queue)
+
+    handler.handle(_record("app.routers.offers"))
+
+    queued = log_queue.get_nowait()
+    assert queued.msg == "hello %s"
+    assert queued.args == ("world",)
@@ -0,0 +1,67 @@
+"""Tests for the fast migration head check."""
+
+import sqlite3
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from app import migrate
+from app.migrate import database_revisions, script_heads, versions_dir
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _write_revision(directory: Path, revision: str, down_revision: str) -> None:
+    (directory / f"{revision}_step.py").write_text(
+        f"revision: str = '{revision}'\ndown_revision = {down_revision}\n\ndef upgrade():\n    pass\n"
+    )
+
+
+def test_script_heads_follow_revision_chain(tmp_path):
+    _write_revision(tmp_path, "base", "None")
+    _write_revision(tmp_path, "left", "'base'")
+    _write_revision(tmp_path, "right", "'base'")
+    assert script_heads(tmp_path) == {"left", "right"}
+
+    _write_revision(tmp_path, "merge", "('left', 'right')")
+    assert script_heads(tmp_path) == {"merge"}
+
+
+def test_repository_has_a_single_head():
+    heads = script_heads(versions_dir(str(REPO_ROOT / "alembic.ini")))
+    assert len(heads) == 1
+
+
+@pytest.fixture()
+def sqlite_url(tmp_path, monkeypatch):
+    path = tmp_path / "app.db"
+    url = f"sqlite+aiosqlite:///{path}"
+    monkeypatch.setattr(migrate.settings, "database_url", url)
+    return path, url
+
+
+async def test_database_revisions(sqlite_url):
+    path, url = sqlite_url
+    assert await database_revisions(url) == set()
+
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE alembic_version (version_num VARCHAR(32) PRIMARY KEY)")
+        conn.execute("INSERT INTO alembic_version VALUES ('abc123')")
+    assert await database_revisions(url) == {"abc123"}
+
+
+def test_migrate_skips_alembic_at_head(sqlite_url):
+    path, _ = sqlite_url
+    config = str(REPO_ROOT / "alembic.ini")
+    (head,) = script_heads(versions_dir(config))
+
+    with patch("alembic.command.upgrade") as upgrade:
+        assert migrate.migrate(config) is True
+        upgrade.assert_called_once()
+
+        with sqlite3.connect(path) as conn:
+            conn.execute("CREATE TABLE alembic_version (version_num VARCHAR(32) PRIMARY KEY)")
+            conn.execute("INSERT INTO alembic_version VALUES (?)", (head,))
+        assert migrate.migrate(config) is False
+        upgrade.assert_called_once()
@@ -1,6 +1,12 @@
+import asyncio
+from datetime import UTC, datetime, timedelta
 from uuid import uuid4
 
-from app.db.models import Offer, Product
+from app.db.models import Offer, OfferPriceRange, OfferPriceRollup, Product
+from app.routers import offers as offers_router
+from app.schemas import ExternalOffer
+from app.services.offers_client import OffersFetch
+from app.services.sync_service import OfferReconciler
 
 
 async def test_get_offers(client, session):
@@ -33,3 +39,238 @@ async def test_get_offers_empty(client, session):
 async def test_get_offers_product_not_found(client):
     response = await client.get(f"/products/{uuid4()}/offers")
     assert response.status_code == 404
+
+
+async def test_get_offers_etag_not_modified(client, session):
+    product = Product(name="Widget")
+    session.add(product)
+    await session.flush()
+    session.add(Offer(id=uuid4(), product_id=product.id, price=1000, items_in_stock=5))
+    await session.commit()
+
+    response = await client.get(f"/products/{product.id}/offers")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert "must-revalidate" in response.headers["cache-control"]
+
+    cached = await client.get(f"/products/{product.id}/offers", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert cached.content == b""
+
+
+async def test_get_offers_etag_changes_after_reconcile(client, session):
+    product = Product(name="Widget", external_id=uuid4())
+    session.add(product)
+    await session.commit()
+
+    etag = (await client.get(f"/products/{product.id}/offers")).headers["etag"]
+
+    reconciler = OfferReconciler(session, product.id)
+    await reconciler.reconcile([ExternalOffer(id=uuid4(), price=1000, items_in_stock=5)])
+    await session.commit()
+
+    response = await client.get(f"/products/{product.id}/offers", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert len(response.json()) == 1
+
+
+async def test_price_history_carries_ranges_across_buckets(client, session):
+    product = Product(name="Widget")
+    session.add(product)
+    await session.flush()
+    now = datetime.now(UTC)
+    # An hour before the window the product had one offer at 1000; then a cheaper one arrived and one got pricier
+    for minutes_ago, low, high in [(120, 1000, 1000), (50, 900, 1000), (5, 900, 1200)]:
+        session.add(OfferPriceRange(
+            product_id=product.id,
+            recorded_at=now - timedelta(minutes=minutes_ago),
+            min_price=low,
+            max_price=high,
+            changes=1,
+        ))
+    await session.commit()
+
+    response = await client.get(
+        f"/products/{product.id}/offers/history",
+        params={"start": (now - timedelta(hours=1)).isoformat(), "end": now.isoformat(), "points": 4},
+    )
+    assert response.status_code == 200
+    series = response.json()
+    # The flat middle of the window still reports the prices in effect
+    assert [(p["min_price"], p["max_price"], p["samples"]) for p in series] == [
+        (900, 1000, 1),
+        (900, 1000, 0),
+        (900, 1000, 0),
+        (900, 1200, 1),
+    ]
+
+
+async def test_price_history_omits_buckets_before_first_change(client, session):
+    product = Product(name="Widget")
+    session.add(product)
+    await session.flush()
+    now = datetime.now(UTC)
+    session.add(OfferPriceRange(
+        product_id=product.id, recorded_at=now - timedelta(minutes=10), min_price=500, max_price=500, changes=1
+    ))
+    await session.commit()
+
+    response = await client.get(
+        f"/products/{product.id}/offers/history",
+        params={"start": (now - timedelta(hours=1)).isoformat(), "end": now.isoformat(), "points": 3},
+    )
+    assert [(p["min_price"], p["max_price"]) for p in response.json()] == [(500, 500)]
+
+
+async def test_price_history_long_window_uses_rollups(client, session):
+    product = Product(name="Widget")
+    session.add(product)
+    await session.flush()
+    now = datetime.now(UTC).replace(minute=0, second=0, microsecond=0)
+    # Per-change ranges must not be consulted for long windows
+    session.add(OfferPriceRange(
+        product_id=product.id, recorded_at=now - timedelta(days=3), min_price=1, max_price=1, changes=1
+    ))
+    for days_ago, low, high, close in [(6, 500, 700, (600, 700)), (3, 400, 800, (400, 400))]:
+        session.add(OfferPriceRollup(
+            product_id=product.id,
+            bucket_start=now - timedelta(days=days_ago),
+            min_price=low,
+            max_price=high,
+            close_min_price=close[0],
+            close_max_price=close[1],
+            samples=2,
+        ))
+    await session.commit()
+
+    response = await client.get(
+        f"/products/{product.id}/offers/history",
+        params={"start": (now - timedelta(days=7)).isoformat(), "end": now.isoformat(), "points": 7},
+    )
+    assert response.status_code == 200
+    assert [(p["min_price"], p["max_price"]) for p in response.json()] == [
+        (500, 700),
+        (600, 700),
+        (600, 700),
+        (400, 800),
+        (400, 400),
+        (400, 400),
+    ]
+
+
+async def test_price_history_product_not_found(client):
+    response = await client.get(f"/products/{uuid4()}/offers/history")
+    assert response.status_code == 404
+
+
+async def test_get_offers_in_stock_sorted_by_price(client, session):
+    product = Product(name="Widget")
+    session.add(product)
+    await session.flush()
+    session.add(Offer(id=uuid4(), product_id=product.id, price=3000, items_in_stock=1))
+    session.add(Offer(id=uuid4(), product_id=product.id, price=1000, items_in_stock=0))
+    session.add(Offer(id=uuid4(), product_id=product.id, price=2000, items_in_stock=4))
+    await session.commit()
+
+    everything = await client.get(f"/products/{product.id}/offers")
+    assert [o["price"] for o in everything.json()] == [1000, 2000, 3000]
+
+    in_stock = await client.get(f"/products/{product.id}/offers", params={"in_stock": "true"})
+    assert [o["price"] for o in in_stock.json()] == [2000, 3000]
+    assert in_stock.headers["etag"] != everything.headers["etag"]
+
+
+async def test_concurrent_offer_reads_are_coalesced(client, session):
+    product = Product(name="Hot")
+    session.add(product)
+    await session.flush()
+    session.add(Offer(id=uuid4(), product_id=product.id, price=1000, items_in_stock=5))
+    await session.commit()
+    before = offers_router.version_flight.stats()
+
+    responses = await asyncio.gather(*(client.get(f"/products/{product.id}/offers") for _ in range(20)))
+
+    assert all(r.status_code == 200 and len(r.json()) == 1 for r in responses)
+    after = offers_router.version_flight.stats()
+    assert after["calls"] - before["calls"] == 20
+    assert after["executions"] - before["executions"] < 20
+
+    metrics = (await client.get("/metrics")).json()
+    assert metrics["singleflight"]["offers_version"]["coalesced"] >= after["coalesced"]
+
+
+async def _registered_product(session) -> Product:
+    product = Product(name="Fresh", external_id=uuid4())
+    session.add(product)
+    await session.commit()
+    return product
+
+
+async def test_sync_product_offers_on_demand(client, session, mock_offers_client):
+    product = await _registered_product(session)
+    mock_offers_client.fetch_offers.return_value = OffersFetch(
+        offers=[ExternalOffer(id=uuid4(), price=1000, items_in_stock=5)], etag='"1"'
+    )
+
+    response = await client.post(f"/products/{product.id}/offers/sync")
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "synced", "not_modified": False, "offer_changes": 1}
+    offers = await client.get(f"/products/{product.id}/offers")
+    assert len(offers.json()) == 1
+    assert "x-offers-synced-at" in offers.headers
+
+
+async def test_concurrent_on_demand_syncs_are_deduplicated(client, session, mock_offers_client):
+    product = await _registered_product(session)
+    release = asyncio.Event()
+
+    async def slow_fetch(*args, **kwargs):
+        await release.wait()
+        return OffersFetch(offers=[])
+
+    mock_offers_client.fetch_offers.side_effect = slow_fetch
+    requests = [asyncio.create_task(client.post(f"/products/{product.id}/offers/sync")) for _ in range(3)]
+    await asyncio.sleep(0.05)
+    release.set()
+
+    responses = await asyncio.gather(*requests)
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert mock_offers_client.fetch_offers.await_count == 1
+
+
+async def test_sync_unregistered_product_conflicts(client, session):
+    product = Product(name="Local only")
+    session.add(product)
+    await session.commit()
+
+    response = await client.post(f"/products/{product.id}/offers/sync")
+    assert response.status_code == 409
+
+
+async def test_max_age_refreshes_only_stale_data(client, session, mock_offers_client):
+    product = await _registered_product(session)
+    mock_offers_client.fetch_offers.return_value = OffersFetch(
+        offers=[ExternalOffer(id=uuid4(), price=1000, items_in_stock=5)]
+    )
+
+    stale = await client.get(f"/products/{product.id}/offers", params={"max_age": 60})
+    assert len(stale.json()) == 1
+    assert mock_offers_client.fetch_offers.await_count == 1
+
+    fresh = await client.get(f"/products/{product.id}/offers", params={"max_age": 60})
+    assert fresh.status_code == 200
+    assert mock_offers_client.fetch_offers.await_count == 1
+
+
+async def test_max_age_serves_cached_offers_when_upstream_fails(client, session, mock_offers_client):
+    product = await _registered_product(session)
+    session.add(Offer(id=uuid4(), product_id=product.id, price=1000, items_in_stock=5))
+    await session.commit()
+    mock_offers_client.fetch_offers.side_effect = RuntimeError("upstream down")
+
+    response = await client.get(f"/products/{product.id}/offers", params={"max_age": 0})
+    assert response.status_code == 200
+    assert len(response.json()) == 1
@@ -0,0 +1,105 @@
+"""Tests for conditional offer fetches against a stand-in offers service."""
+
+import re
+from unittest.mock import patch
+from uuid import UUID, uuid4
+
+import httpx
+import pytest
+
+from app.config import PRIMARY_SOURCE, settings
+from app.db.models import Offer, OfferSyncState, Product
+from app.services.offers_client import OffersClient
+from app.tasks.scheduler import sync_all_offers
+
+
+class FakeOffersService:
+    """Minimal offers API honouring If-None-Match."""
+
+    def __init__(self) -> None:
+        self.offers: dict[UUID, list[dict]] = {}
+        self.versions: dict[UUID, int] = {}
+        self.requests: list[httpx.Request] = []
+
+    def set_offers(self, product_id: UUID, offers: list[dict]) -> None:
+        self.offers[product_id] = offers
+        self.versions[product_id] = self.versions.get(product_id, 0) + 1
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.url.path == "/api/v1/auth":
+            return httpx.Response(201, json={"access_token": "token"})
+
+        product_id = UUID(request.url.path.split("/")[-2])
+        etag = f'"{self.versions.get(product_id, 0)}"'
+        if request.headers.get("if-none-match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        return httpx.Response(200, json=self.offers.get(product_id, []), headers={"ETag": etag})
+
+
+@pytest.fixture()
+def offers_service(httpx_mock):
+    service = FakeOffersService()
+    httpx_mock.add_callback(service, url=re.compile(re.escape(settings.offers_service_url) + ".*"), is_reusable=True)
+    return service
+
+
+@pytest.fixture()
+async def offers_client():
+    client = OffersClient()
+    yield client
+    await client._client.aclose()
+
+
+async def test_fetch_offers_sends_validators(offers_service, offers_client):
+    product_id = uuid4()
+    offers_service.set_offers(product_id, [{"id": str(uuid4()), "price": 100, "items_in_stock": 1}])
+
+    first = await offers_client.fetch_offers(product_id)
+    assert not first.not_modified
+    assert len(first.offers) == 1
+    assert first.content_length > 0
+
+    second = await offers_client.fetch_offers(product_id, etag=first.etag)
+    assert second.not_modified
+    assert second.etag == first.etag
+    assert offers_service.requests[-1].headers["if-none-match"] == first.etag
+
+
+async def test_sync_skips_reconcile_when_not_modified(db, session, offers_service, offers_client):
+    product = Product(name="Widget", external_id=uuid4())
+    session.add(product)
+    await session.commit()
+    offer = {"id": str(uuid4()), "price": 100, "items_in_stock": 1}
+    offers_service.set_offers(product.external_id, [offer])
+
+    with patch("app.services.offers_client.OffersClient.get", return_value=offers_client):
+        first = await sync_all_offers()
+        second = await sync_all_offers()
+
+    assert first.reconciled == 1
+    assert first.bytes_downloaded > 0
+
+    assert second.reconciled == 0
+    assert second.not_modified == 1
+    assert second.bytes_downloaded == 0
+    assert second.bytes_saved == first.bytes_downloaded
+
+    state = await session.get(OfferSyncState, (product.id, PRIMARY_SOURCE))
+    assert state.etag == '"1"'
+    assert await session.get(Offer, UUID(offer["id"])) is not None
+
+
+async def test_sync_reconciles_after_upstream_change(db, session, offers_service, offers_client):
+    product = Product(name="Widget", external_id=uuid4())
+    session.add(product)
+    await session.commit()
+    offers_service.set_offers(product.external_id, [{"id": str(uuid4()), "price": 100, "items_in_stock": 1}])
+
+    with patch("app.services.offers_client.OffersClient.get", return_value=offers_client):
+        await sync_all_offers()
+        offers_service.set_offers(product.external_id, [])
+        stats = await sync_all_offers()
+
+    assert stats.reconciled == 1
+    assert stats.not_modified == 0
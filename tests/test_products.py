@@ -1,7 +1,16 @@
 """Tests for product CRUD endpoints."""
 
+import re
+from datetime import UTC, datetime
 from uuid import uuid4
 
+from sqlalchemy import event, func, select
+
+from app.config import settings
+from app.db.models import Offer, OfferHistory, Product
+from app.tasks.purge import purge_deleted_products
+from app.tasks.scheduler import registered_products_query
+
 
 async def test_create_product(client):
     response = await client.post("/products", json={"name": "something", "description": "a fine something"})
@@ -57,6 +66,30 @@ async def test_update_product(client):
     assert data["description"] == "something new"
 
 
+async def test_update_product_keeps_concurrent_version_bump(client, session, engine):
+    product = Product(name="old")
+    session.add(product)
+    await session.commit()
+    bumped = False
+
+    def concurrent_reconcile(conn, cursor, statement, parameters, context, executemany) -> None:
+        # A reconcile commits its version bump right before the update is written
+        nonlocal bumped
+        if statement.startswith("UPDATE product") and not bumped:
+            bumped = True
+            cursor.execute("UPDATE product SET version = version + 1")
+
+    event.listen(engine.sync_engine, "before_cursor_execute", concurrent_reconcile)
+    try:
+        response = await client.put(f"/products/{product.id}", json={"name": "new", "description": None})
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", concurrent_reconcile)
+
+    assert response.status_code == 200
+    assert bumped
+    assert await session.scalar(select(Product.version).where(Product.id == product.id)) == 3
+
+
 async def test_update_product_clears_description(client):
     create = await client.post("/products", json={"name": "old", "description": "something old"})
     product_id = create.json()["id"]
@@ -85,3 +118,106 @@ async def test_delete_product(client):
 async def test_delete_product_not_found(client):
     response = await client.delete(f"/products/{uuid4()}")
     assert response.status_code == 404
+
+
+async def test_get_product_etag(client):
+    create = await client.post("/products", json={"name": "cached"})
+    product_id = create.json()["id"]
+
+    response = await client.get(f"/products/{product_id}")
+    etag = response.headers["etag"]
+
+    cached = await client.get(f"/products/{product_id}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+
+    await client.put(f"/products/{product_id}", json={"name": "renamed"})
+    refreshed = await client.get(f"/products/{product_id}", headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.headers["etag"] != etag
+
+
+async def test_create_product_holds_no_connection_during_registration(client, engine, mock_offers_client):
+    checked_out = 0
+
+    def on_checkout(*args):
+        nonlocal checked_out
+        checked_out += 1
+
+    def on_checkin(*args):
+        nonlocal checked_out
+        checked_out -= 1
+
+    event.listen(engine.sync_engine.pool, "checkout", on_checkout)
+    event.listen(engine.sync_engine.pool, "checkin", on_checkin)
+    during_registration = []
+
+    async def register(*args):
+        during_registration.append(checked_out)
+        return uuid4()
+
+    mock_offers_client.register_product.side_effect = register
+    response = await client.post("/products", json={"name": "lean"})
+
+    assert response.status_code == 201
+    assert during_registration == [0]
+    assert checked_out == 0
+
+
+async def _product_with_offers(session, offers: int) -> Product:
+    product = Product(name="Widget", external_id=uuid4())
+    session.add(product)
+    await session.flush()
+    session.add_all(Offer(id=uuid4(), product_id=product.id, price=100 + i, items_in_stock=1) for i in range(offers))
+    await session.commit()
+    return product
+
+
+async def test_delete_product_cascades_in_database(client, session, engine):
+    product = await _product_with_offers(session, 5)
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    response = await client.delete(f"/products/{product.id}")
+    assert response.status_code == 204
+    # One DELETE on product; offers go through ON DELETE CASCADE, never loaded or deleted one by one
+    assert not any(re.search(r"\bFROM offer\b", s) for s in statements)
+    remaining = await session.scalar(select(func.count()).select_from(Offer))
+    assert remaining == 0
+
+
+async def test_soft_delete_hides_product_until_purged(client, session, monkeypatch):
+    monkeypatch.setattr(settings, "soft_delete", True)
+    product = await _product_with_offers(session, 5)
+
+    response = await client.delete(f"/products/{product.id}")
+    assert response.status_code == 204
+    assert (await client.delete(f"/products/{product.id}")).status_code == 404
+
+    assert (await client.get(f"/products/{product.id}")).status_code == 404
+    assert (await client.get("/products")).json() == []
+    assert (await client.get(f"/products/{product.id}/offers")).status_code == 404
+    assert (await client.get(f"/products/{product.id}/offers/best")).status_code == 404
+
+    async with session.bind.connect() as conn:
+        synced = (await conn.execute(registered_products_query())).all()
+    assert synced == []
+    # Rows stay until the purge job runs
+    assert await session.scalar(select(func.count()).select_from(Offer)) == 5
+
+
+async def test_purge_removes_soft_deleted_products_in_batches(session, test_session_factory, monkeypatch):
+    monkeypatch.setattr("app.db.database.session_factory", test_session_factory)
+    kept = await _product_with_offers(session, 2)
+    doomed = await _product_with_offers(session, 5)
+    session.add(OfferHistory(product_id=doomed.id, offer_id=uuid4(), price=1, items_in_stock=1))
+    doomed.deleted_at = datetime.now(UTC)
+    await session.commit()
+
+    assert await purge_deleted_products(batch_size=2) == 1
+
+    assert await session.scalar(select(func.count()).select_from(Offer)) == 2
+    assert await session.scalar(select(func.count()).select_from(OfferHistory)) == 0
+    session.expunge_all()
+    assert await session.get(Product, doomed.id) is None
+    assert await session.get(Product, kept.id) is not None
+    assert await purge_deleted_products() == 0
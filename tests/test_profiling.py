@@ -0,0 +1,83 @@
+"""Tests for the request-scoped query profiler."""
+
+import logging
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import func, select, text
+
+from app.db.models import Offer, Product
+from app.db.profiling import QueryProfilerMiddleware, _EXPLAIN_PREFIX, install_query_hooks, profile_queries
+
+
+async def test_profile_counts_statements(engine, session):
+    install_query_hooks(engine)
+
+    with profile_queries() as profile:
+        await session.execute(select(Product))
+        await session.execute(text("SELECT 1"))
+
+    assert profile.statements == 2
+    assert profile.db_time > 0
+    assert len(profile.slowest) == 2
+
+
+async def test_profile_flags_repeated_selects(engine, session, monkeypatch, caplog):
+    monkeypatch.setattr("app.db.profiling.settings.n_plus_one_threshold", 3)
+    install_query_hooks(engine)
+    product = Product(name="Widget")
+    session.add(product)
+    await session.commit()
+
+    with profile_queries() as profile, caplog.at_level(logging.WARNING, logger="app.db.profiling"):
+        for _ in range(5):
+            await session.execute(select(Offer).where(Offer.product_id == product.id))
+
+    assert len(profile.repeated) == 1
+    assert sum("Possible N+1" in r.message for r in caplog.records) == 1
+
+
+async def test_slow_query_log_captures_plan(engine, session, monkeypatch, caplog):
+    monkeypatch.setattr("app.db.profiling.settings.slow_query_ms", 0.0)
+    install_query_hooks(engine)
+
+    with caplog.at_level(logging.WARNING, logger="app.db.slow_queries"):
+        await session.execute(select(Offer.id).where(Offer.price > 5))
+
+    [record] = [r for r in caplog.records if r.name == "app.db.slow_queries"]
+    assert "Slow query" in record.message
+    assert "SCAN offer" in record.plan
+
+
+async def test_failed_explain_leaves_the_transaction_usable(engine, session, monkeypatch, caplog):
+    monkeypatch.setattr("app.db.profiling.settings.slow_query_ms", 0.0)
+    monkeypatch.setitem(_EXPLAIN_PREFIX, "sqlite", "EXPLAIN NOT A PLAN ")
+    install_query_hooks(engine)
+    session.add(Product(name="Widget"))
+    await session.flush()
+
+    with caplog.at_level(logging.WARNING, logger="app.db.profiling"):
+        await session.execute(select(Product.id))
+    await session.commit()
+
+    assert any("EXPLAIN failed" in r.message for r in caplog.records)
+    assert await session.scalar(select(func.count()).select_from(Product)) == 1
+
+
+async def test_middleware_sets_server_timing(engine, test_session_factory):
+    install_query_hooks(engine)
+    app = FastAPI()
+    app.add_middleware(QueryProfilerMiddleware)
+
+    @app.get("/probe")
+    async def probe():
+        async with test_session_factory() as session:
+            await session.execute(text("SELECT 1"))
+            await session.execute(text("SELECT 2"))
+        return {}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/probe")
+
+    assert response.headers["server-timing"].startswith("db;dur=")
+    assert 'desc="2 statements"' in response.headers["server-timing"]
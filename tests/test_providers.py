@@ -0,0 +1,239 @@
+"""Tests for parallel multi-provider offer sync."""
+
+import asyncio
+from unittest.mock import patch
+from uuid import UUID, uuid4
+
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import event, select
+
+from app.config import OfferProviderSettings, PRIMARY_SOURCE, Settings, settings
+from app.db.models import Offer, OfferSyncState, Product
+from app.schemas import ExternalOffer
+from app.services.offers_client import OffersFetch, RateLimiter
+from app.services.providers import OfferProvider, provider_metrics
+from app.services.sync_service import SyncStats, sync_product
+from tests.conftest import StubOffersClient
+
+
+def _offer(price: int, offer_id: UUID | None = None) -> ExternalOffer:
+    return ExternalOffer(id=offer_id or uuid4(), price=price, items_in_stock=1)
+
+
+@pytest.fixture()
+def metrics():
+    provider_metrics.clear()
+    yield provider_metrics
+    provider_metrics.clear()
+
+
+@pytest.fixture()
+def extra_providers():
+    configured = [
+        OfferProviderSettings(name=name, url=f"https://{name}.test", refresh_token="x")  # noqa: S106 - fake credential
+        for name in ("acme", "slow")
+    ]
+    with patch.object(settings, "offer_providers", configured):
+        yield
+
+
+async def _product(session) -> Product:
+    product = Product(name="Widget", description="A widget", external_id=uuid4())
+    session.add(product)
+    await session.commit()
+    return product
+
+
+async def _offers_by_source(session, product_id: UUID) -> dict[UUID, str]:
+    result = await session.execute(select(Offer.id, Offer.source).where(Offer.product_id == product_id))
+    return dict(result.all())
+
+
+async def test_offers_from_all_providers_are_merged_by_source(db, session, metrics, extra_providers):
+    product = await _product(session)
+    shared = uuid4()
+    primary = StubOffersClient([_offer(100), _offer(150, shared)])
+    acme = StubOffersClient([_offer(90), _offer(160, shared), _offer(90)])
+    providers = [
+        OfferProvider(PRIMARY_SOURCE, primary, timeout=1),
+        OfferProvider("acme", acme, timeout=1),
+    ]
+
+    stats = SyncStats()
+    events = await sync_product(providers, product.id, product.external_id, stats)
+
+    offers = await _offers_by_source(session, product.id)
+    assert len(offers) == 4
+    assert list(offers.values()).count("acme") == 2
+    assert offers[shared] == PRIMARY_SOURCE  # the source that stored it first keeps a duplicate id
+    assert len(events) == 4
+    assert stats.reconciled == 2
+
+    # The primary service is addressed by product.external_id, others by their own registration
+    assert primary.fetched == [product.external_id]
+    assert acme.registered == [product.id]
+    acme_state = await session.get(OfferSyncState, (product.id, "acme"))
+    assert acme.fetched == [acme_state.external_id]
+
+
+class VersionedClient(StubOffersClient):
+    """Answers 304 while the request's validator matches the current `version` of its offers."""
+
+    version = 1
+
+    async def fetch_offers(self, external_id: UUID, etag=None, last_modified=None) -> OffersFetch:
+        fetch = await super().fetch_offers(external_id, etag, last_modified)
+        current = f'"{self.version}"'
+        if etag == current:
+            return OffersFetch(offers=None, etag=current)
+        return OffersFetch(offers=fetch.offers, etag=current, content_length=fetch.content_length)
+
+
+async def test_duplicate_is_taken_over_once_its_owner_drops_it(db, session, metrics, extra_providers):
+    product = await _product(session)
+    shared = _offer(150)
+    primary, acme = VersionedClient([shared]), VersionedClient([shared])
+    providers = [OfferProvider(PRIMARY_SOURCE, primary, timeout=1), OfferProvider("acme", acme, timeout=1)]
+    await sync_product(providers, product.id, product.external_id, SyncStats())
+
+    assert (await _offers_by_source(session, product.id))[shared.id] == PRIMARY_SOURCE
+    session.expunge_all()
+    assert (await session.get(OfferSyncState, (product.id, "acme"))).etag is None
+
+    # The primary drops the offer; acme's response is unchanged but must not be answered with a 304
+    primary.offers, primary.version = [_offer(100)], 2
+    stats = SyncStats()
+    await sync_product(providers, product.id, product.external_id, stats)
+
+    assert (await _offers_by_source(session, product.id))[shared.id] == "acme"
+    assert (stats.reconciled, stats.not_modified) == (2, 0)
+    session.expunge_all()
+    assert (await session.get(OfferSyncState, (product.id, "acme"))).etag == '"1"'
+
+
+async def test_slow_provider_times_out_without_dropping_others(db, session, metrics, extra_providers):
+    product = await _product(session)
+    slow_offer = _offer(50)
+    session.add(Offer(id=slow_offer.id, product_id=product.id, price=50, items_in_stock=1, source="slow"))
+    await session.commit()
+    providers = [
+        OfferProvider(PRIMARY_SOURCE, StubOffersClient([_offer(100)]), timeout=1),
+        OfferProvider("slow", StubOffersClient(hang=True), timeout=0.05),
+    ]
+
+    stats = SyncStats()
+    await asyncio.wait_for(sync_product(providers, product.id, product.external_id, stats), 1)
+
+    offers = await _offers_by_source(session, product.id)
+    assert sorted(offers.values()) == [PRIMARY_SOURCE, "slow"]  # the slow source's offers are kept
+    assert (stats.reconciled, stats.provider_errors) == (1, 1)
+    assert metrics["slow"].stats()["timeouts"] == 1
+    assert metrics[PRIMARY_SOURCE].stats()["fetches"] == 1
+    assert "p95" in metrics[PRIMARY_SOURCE].stats()["latency_ms"]
+
+
+async def test_each_source_is_committed_and_published_as_it_answers(
+    db, session, test_session_factory, metrics, extra_providers
+):
+    product = await _product(session)
+    primary_offer = _offer(100)
+    released = asyncio.Event()
+    seen_while_waiting = []
+    published = []
+
+    class GatedClient(StubOffersClient):
+        async def fetch_offers(self, external_id: UUID, etag=None, last_modified=None) -> OffersFetch:
+            await asyncio.sleep(0.05)  # let the primary answer first
+            async with test_session_factory() as other:
+                seen_while_waiting.append(await _offers_by_source(other, product.id))
+            seen_while_waiting.append([e.offer_id for batch in published for e in batch])
+            await released.wait()
+            return await super().fetch_offers(external_id, etag, last_modified)
+
+    providers = [
+        OfferProvider(PRIMARY_SOURCE, StubOffersClient([primary_offer]), timeout=1),
+        OfferProvider("acme", GatedClient([_offer(90)]), timeout=1),
+    ]
+    sync = asyncio.create_task(sync_product(providers, product.id, product.external_id, SyncStats(), published.append))
+    while len(seen_while_waiting) < 2:
+        await asyncio.sleep(0.01)
+    released.set()
+    events = await sync
+
+    assert seen_while_waiting == [{primary_offer.id: PRIMARY_SOURCE}, [primary_offer.id]]
+    assert len(published) == 2
+    assert len(events) == 2
+
+
+async def test_no_connection_is_held_while_fetching(db, engine, session, metrics):
+    product = await _product(session)
+    await session.close()
+    checked_out = 0
+
+    def on_checkout(*args) -> None:
+        nonlocal checked_out
+        checked_out += 1
+
+    def on_checkin(*args) -> None:
+        nonlocal checked_out
+        checked_out -= 1
+
+    event.listen(engine.sync_engine, "checkout", on_checkout)
+    event.listen(engine.sync_engine, "checkin", on_checkin)
+    during_fetch = []
+
+    class ObservingClient(StubOffersClient):
+        async def fetch_offers(self, external_id: UUID, etag=None, last_modified=None) -> OffersFetch:
+            during_fetch.append(checked_out)
+            return await super().fetch_offers(external_id, etag, last_modified)
+
+    providers = [OfferProvider(PRIMARY_SOURCE, ObservingClient([_offer(100)]), timeout=1)]
+    await sync_product(providers, product.id, product.external_id, SyncStats())
+
+    assert during_fetch == [0]
+    assert len(await _offers_by_source(session, product.id)) == 1
+
+
+async def test_sync_fails_only_when_every_provider_fails(db, session, metrics, extra_providers):
+    product = await _product(session)
+    providers = [
+        OfferProvider(PRIMARY_SOURCE, StubOffersClient(fail=True), timeout=1),
+        OfferProvider("acme", StubOffersClient(fail=True), timeout=1),
+    ]
+
+    with pytest.raises(RuntimeError, match="provider down"):
+        await sync_product(providers, product.id, product.external_id, SyncStats())
+    assert metrics["acme"].errors == 1
+
+
+async def test_offers_of_unconfigured_sources_are_removed(db, session, metrics):
+    product = await _product(session)
+    gone = uuid4()
+    session.add(OfferSyncState(product_id=product.id, source="retired", external_id=uuid4(), content_length=0))
+    session.add(Offer(id=gone, product_id=product.id, price=10, items_in_stock=1, source="retired"))
+    await session.commit()
+
+    providers = [OfferProvider(PRIMARY_SOURCE, StubOffersClient([_offer(100)]), timeout=1)]
+    events = await sync_product(providers, product.id, product.external_id, SyncStats())
+
+    assert gone not in await _offers_by_source(session, product.id)
+    session.expunge_all()
+    assert await session.get(OfferSyncState, (product.id, "retired")) is None
+    assert gone in {e.offer_id for e in events}
+
+
+async def test_rate_limiter_spaces_requests():
+    limiter = RateLimiter(rate=20)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await asyncio.gather(*(limiter.acquire() for _ in range(4)))
+    assert loop.time() - start >= 0.14  # three intervals of 50 ms after the first request
+
+
+def test_provider_names_must_be_unique():
+    provider = {"name": "acme", "url": "https://acme.test", "refresh_token": "x"}
+    with pytest.raises(ValidationError):
+        Settings(offer_providers=[provider, provider])
+    with pytest.raises(ValidationError):
+        Settings(offer_providers=[provider | {"name": PRIMARY_SOURCE}])
@@ -0,0 +1,149 @@
+"""Tests for sync run checkpointing and graceful shutdown."""
+
+import asyncio
+from unittest.mock import patch
+from uuid import uuid4
+
+from app.db.models import Product, SyncCheckpoint
+from app.services.sync_service import sync_flight
+from app.tasks import scheduler
+from app.tasks.scheduler import CHECKPOINT_JOB, stop_scheduler, sync_all_offers
+from tests.conftest import StubOffersClient
+
+
+async def _make_products(session, count: int) -> list[Product]:
+    products = [Product(name=f"Product {i}", external_id=uuid4()) for i in range(count)]
+    session.add_all(products)
+    await session.commit()
+    return sorted(products, key=lambda p: p.id.hex)
+
+
+async def test_completed_run_starts_over(db, session):
+    products = await _make_products(session, 3)
+    client = StubOffersClient()
+
+    with patch("app.services.offers_client.OffersClient.get", return_value=client):
+        first = await sync_all_offers()
+        await sync_all_offers()
+
+    assert first.products == 3
+    assert client.fetched == [p.external_id for p in products] * 2
+    checkpoint = await session.get(SyncCheckpoint, CHECKPOINT_JOB)
+    assert checkpoint.completed_at is not None
+    assert checkpoint.last_product_id == products[-1].id
+
+
+async def test_interrupted_run_resumes_after_checkpoint(db, session):
+    products = await _make_products(session, 4)
+    client = StubOffersClient()
+
+    with patch("app.services.offers_client.OffersClient.get", return_value=client):
+        await sync_all_offers()
+        # Simulate a process that died after finishing the second product
+        checkpoint = await session.get(SyncCheckpoint, CHECKPOINT_JOB)
+        run_id = checkpoint.run_id
+        checkpoint.completed_at = None
+        checkpoint.last_product_id = products[1].id
+        await session.commit()
+        client.fetched.clear()
+
+        stats = await sync_all_offers()
+
+    assert stats.products == 2
+    assert client.fetched == [p.external_id for p in products[2:]]
+    await session.refresh(checkpoint)
+    assert checkpoint.run_id == run_id
+    assert checkpoint.completed_at is not None
+
+
+async def test_stop_drains_cycle_and_leaves_checkpoint(db, session):
+    products = await _make_products(session, 3)
+    client = StubOffersClient(pause_on=products[1].external_id)
+
+    with patch("app.services.offers_client.OffersClient.get", return_value=client):
+        cycle = asyncio.create_task(sync_all_offers())
+        await client.paused.wait()
+
+        stopping = asyncio.create_task(stop_scheduler())
+        await asyncio.sleep(0)
+        assert not stopping.done()
+        client.release.set()
+        await stopping
+
+        stats = await cycle
+        assert stats.products == 2
+        assert client.fetched == [p.external_id for p in products[:2]]
+        assert not scheduler._stopping
+
+        checkpoint = await session.get(SyncCheckpoint, CHECKPOINT_JOB)
+        assert checkpoint.completed_at is None
+        assert checkpoint.last_product_id == products[1].id
+
+        # The next start picks up the remaining product only
+        client.fetched.clear()
+        await sync_all_offers()
+    assert client.fetched == [products[2].external_id]
+
+
+async def test_stop_cancels_cycle_after_drain_timeout(db, session, monkeypatch):
+    products = await _make_products(session, 2)
+    client = StubOffersClient(pause_on=products[0].external_id)
+    monkeypatch.setattr(scheduler.settings, "sync_drain_timeout", 0.01)
+
+    with patch("app.services.offers_client.OffersClient.get", return_value=client):
+        cycle = asyncio.create_task(sync_all_offers())
+        await client.paused.wait()
+        await stop_scheduler()
+
+    assert cycle.cancelled()
+    # The cycle's shielded product sync is cancelled too, before the providers are closed
+    assert sync_flight.stats()["in_flight"] == 0
+    checkpoint = await session.get(SyncCheckpoint, CHECKPOINT_JOB)
+    assert checkpoint.last_product_id is None
+
+
+async def test_stop_waits_for_in_flight_product_syncs(db, session):
+    [product] = await _make_products(session, 1)
+    client = StubOffersClient(pause_on=product.external_id)
+
+    with patch("app.services.offers_client.OffersClient.get", return_value=client):
+        sync = scheduler.start_product_sync(scheduler.offer_providers(), product.id, product.external_id)
+        await client.paused.wait()
+
+        stopping = asyncio.create_task(stop_scheduler())
+        await asyncio.sleep(0)
+        assert not stopping.done()
+        client.release.set()
+        await stopping
+
+    assert (await sync).products == 1
+
+
+async def test_checkpoint_is_saved_in_batches(db, session, monkeypatch):
+    products = await _make_products(session, 5)
+    monkeypatch.setattr(scheduler, "_CHECKPOINT_EVERY", 2)
+    saves = []
+    save_checkpoint = scheduler._save_checkpoint
+
+    async def record_save(run_id, **values):
+        saves.append(values)
+        await save_checkpoint(run_id, **values)
+
+    monkeypatch.setattr(scheduler, "_save_checkpoint", record_save)
+    with patch("app.services.offers_client.OffersClient.get", return_value=StubOffersClient()):
+        await sync_all_offers()
+
+    assert [s["last_product_id"] for s in saves] == [products[1].id, products[3].id, products[4].id]
+    assert "completed_at" in saves[-1]
+
+
+async def test_purge_is_scheduled_without_a_sync_schedule(monkeypatch):
+    monkeypatch.setattr(scheduler.settings, "sync_schedule", "")
+    monkeypatch.setattr(scheduler.settings, "soft_delete", True)
+
+    scheduler.start_scheduler()
+    try:
+        assert [job.id for job in scheduler.scheduler.get_jobs()] == ["purge_products"]
+    finally:
+        await stop_scheduler()
+    assert scheduler.scheduler is None
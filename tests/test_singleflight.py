@@ -0,0 +1,94 @@
+"""Tests for request coalescing."""
+
+import asyncio
+
+import pytest
+
+from app.services.singleflight import SingleFlight
+
+
+async def test_concurrent_calls_share_one_execution():
+    flight: SingleFlight[str, int] = SingleFlight()
+    release = asyncio.Event()
+    executions = 0
+
+    async def load() -> int:
+        nonlocal executions
+        executions += 1
+        await release.wait()
+        return 42
+
+    waiters = [asyncio.create_task(flight.do("key", load)) for _ in range(10)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*waiters) == [42] * 10
+    assert executions == 1
+    assert flight.stats() == {"calls": 10, "executions": 1, "coalesced": 9, "in_flight": 0}
+
+
+async def test_sequential_calls_are_not_cached():
+    flight: SingleFlight[str, int] = SingleFlight()
+    results = iter([1, 2])
+
+    async def load() -> int:
+        return next(results)
+
+    assert await flight.do("key", load) == 1
+    assert await flight.do("key", load) == 2
+    assert flight.coalesced == 0
+
+
+async def test_errors_reach_all_waiters():
+    flight: SingleFlight[str, int] = SingleFlight()
+    release = asyncio.Event()
+
+    async def load() -> int:
+        await release.wait()
+        raise ValueError("boom")
+
+    waiters = [asyncio.create_task(flight.do("key", load)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+async def test_cancelled_caller_does_not_cancel_others():
+    flight: SingleFlight[str, int] = SingleFlight()
+    release = asyncio.Event()
+
+    async def load() -> int:
+        await release.wait()
+        return 7
+
+    leader = asyncio.create_task(flight.do("key", load))
+    follower = asyncio.create_task(flight.do("key", load))
+    await asyncio.sleep(0)
+    leader.cancel()
+    release.set()
+
+    assert await follower == 7
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+async def test_drain_cancels_calls_still_running_at_the_timeout():
+    flight: SingleFlight[str, int] = SingleFlight()
+    release = asyncio.Event()
+
+    async def quick() -> int:
+        return 1
+
+    async def stuck() -> int:
+        await release.wait()
+        return 2
+
+    done = flight.start("quick", quick)
+    hung = flight.start("stuck", stuck)
+
+    assert await flight.drain(timeout=0.01) == 1
+    assert done.result() == 1
+    assert hung.cancelled()
+    assert flight.stats()["in_flight"] == 0
@@ -0,0 +1,201 @@
+"""Tests for the in-memory offer snapshot."""
+
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db.models import Offer, Product
+from app.schemas import ExternalOffer
+from app.services import snapshot as snapshot_module
+from app.services.snapshot import OfferSnapshot
+from app.services.sync_service import OfferReconciler
+
+
+@pytest.fixture()
+def live_snapshot(monkeypatch):
+    snap = OfferSnapshot()
+    snap.ready = True
+    monkeypatch.setattr("app.routers.offers.snapshot", snap)
+    monkeypatch.setattr("app.routers.products.snapshot", snap)
+    return snap
+
+
+def test_best_offer_and_in_stock_ids_follow_price_order():
+    snap = OfferSnapshot()
+    product_id = uuid4()
+    cheap_sold_out, mid, dear = uuid4(), uuid4(), uuid4()
+    snap.replace(product_id, [(dear, 3000, 1), (cheap_sold_out, 1000, 0), (mid, 2000, 4)])
+
+    assert snap.best_offer(product_id) == (mid, 2000, 4)
+    assert snap.in_stock_ids(product_id) == [mid, dear]
+    assert [row[0] for row in snap.offers(product_id)] == [cheap_sold_out, mid, dear]
+
+
+def test_replace_compacts_abandoned_rows():
+    snap = OfferSnapshot()
+    product_id, other_id = uuid4(), uuid4()
+    other_offers = [(uuid4(), 500, 1)]
+    snap.replace(other_id, other_offers)
+
+    for price in range(3000):
+        snap.replace(product_id, [(uuid4(), price, 1)])
+
+    stats = snap.stats()
+    assert stats["offers"] == 2
+    assert stats["garbage"] < 1100
+    assert stats["column_bytes"] == len(snap._prices) * 24
+    assert snap.offers(other_id) == other_offers
+    assert snap.best_offer(product_id)[1] == 2999
+
+
+async def test_apply_folds_reconciler_events(session):
+    product = Product(name="Widget", external_id=uuid4())
+    session.add(product)
+    await session.flush()
+    kept, repriced, dropped = uuid4(), uuid4(), uuid4()
+    session.add_all([
+        Offer(id=kept, product_id=product.id, price=1000, items_in_stock=0),
+        Offer(id=repriced, product_id=product.id, price=2000, items_in_stock=2),
+        Offer(id=dropped, product_id=product.id, price=3000, items_in_stock=3),
+    ])
+    await session.commit()
+
+    snap = OfferSnapshot()
+    await snap.load(session)
+    assert snap.best_offer(product.id) == (repriced, 2000, 2)
+
+    added = uuid4()
+    reconciler = OfferReconciler(session, product.id)
+    await reconciler.reconcile([
+        ExternalOffer(id=kept, price=1000, items_in_stock=0),
+        ExternalOffer(id=repriced, price=900, items_in_stock=2),
+        ExternalOffer(id=added, price=1500, items_in_stock=7),
+    ])
+    snap.apply(reconciler.events)
+
+    assert snap.offers(product.id) == [(repriced, 900, 2), (kept, 1000, 0), (added, 1500, 7)]
+
+
+async def test_load_includes_products_without_offers(session):
+    product = Product(name="loner")
+    session.add(product)
+    await session.commit()
+
+    snap = OfferSnapshot()
+    await snap.load(session)
+
+    assert product.id in snap
+    assert snap.in_stock_ids(product.id) == []
+
+
+async def test_best_offer_endpoint_served_from_snapshot(client, live_snapshot):
+    # Not in the database at all: a 200 proves the DB was not consulted
+    product_id, offer_id = uuid4(), uuid4()
+    live_snapshot.replace(product_id, [(offer_id, 1200, 3)])
+
+    response = await client.get(f"/products/{product_id}/offers/best")
+    assert response.status_code == 200
+    assert response.json() == {"id": str(offer_id), "product_id": str(product_id), "price": 1200, "items_in_stock": 3}
+
+    ids = await client.get(f"/products/{product_id}/offers/in-stock")
+    assert ids.json() == [str(offer_id)]
+
+
+async def test_best_offer_endpoint_falls_back_to_database(client, session):
+    assert not snapshot_module.snapshot.ready
+    product = Product(name="Widget")
+    session.add(product)
+    await session.flush()
+    cheapest = uuid4()
+    session.add_all([
+        Offer(id=uuid4(), product_id=product.id, price=500, items_in_stock=0),
+        Offer(id=cheapest, product_id=product.id, price=800, items_in_stock=1),
+    ])
+    await session.commit()
+
+    response = await client.get(f"/products/{product.id}/offers/best")
+    assert response.status_code == 200
+    assert response.json()["id"] == str(cheapest)
+
+    ids = await client.get(f"/products/{product.id}/offers/in-stock")
+    assert ids.json() == [str(cheapest)]
+
+
+async def test_best_offer_endpoint_not_found(client, session, live_snapshot):
+    sold_out = Product(name="Sold out")
+    session.add(sold_out)
+    await session.commit()
+    live_snapshot.replace(sold_out.id, [(uuid4(), 100, 0)])
+
+    assert (await client.get(f"/products/{sold_out.id}/offers/best")).json()["detail"] == "No offer in stock"
+    missing = await client.get(f"/products/{uuid4()}/offers/best")
+    assert missing.status_code == 404
+    assert missing.json()["detail"] == "Product not found"
+    assert (await client.get(f"/products/{uuid4()}/offers/in-stock")).status_code == 404
+
+
+async def test_delete_product_evicts_snapshot(client, session, live_snapshot):
+    product = Product(name="Widget")
+    session.add(product)
+    await session.commit()
+    live_snapshot.replace(product.id, [(uuid4(), 100, 1)])
+
+    response = await client.delete(f"/products/{product.id}")
+    assert response.status_code == 204
+    assert product.id not in live_snapshot
+
+
+async def test_stale_block_is_reloaded_when_product_version_moved(client, session, live_snapshot, monkeypatch):
+    product = Product(name="Widget")
+    session.add(product)
+    await session.flush()
+    offer_id = uuid4()
+    session.add(Offer(id=offer_id, product_id=product.id, price=1000, items_in_stock=1))
+    await session.commit()
+    await live_snapshot.load(session)
+    live_snapshot.ready = True
+
+    # Another process syncs the product; this process never sees its events
+    offer = await session.get(Offer, offer_id)
+    offer.price = 700
+    product.version += 1
+    await session.commit()
+
+    assert (await client.get(f"/products/{product.id}/offers/best")).json()["price"] == 1000
+    monkeypatch.setattr(settings, "snapshot_max_staleness", 0)
+    assert (await client.get(f"/products/{product.id}/offers/best")).json()["price"] == 700
+    assert live_snapshot.offers(product.id) == [(offer_id, 700, 1)]
+
+
+async def test_stale_block_of_deleted_product_is_evicted(client, session, live_snapshot, monkeypatch):
+    product = Product(name="Widget")
+    session.add(product)
+    await session.commit()
+    live_snapshot.replace(product.id, [(uuid4(), 100, 1)], version=product.version)
+
+    # Deleted by another process
+    await session.delete(product)
+    await session.commit()
+    monkeypatch.setattr(settings, "snapshot_max_staleness", 0)
+
+    response = await client.get(f"/products/{product.id}/offers/best")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Product not found"
+    assert product.id not in live_snapshot
+
+
+async def test_failed_delete_keeps_snapshot_block(client, session, live_snapshot, monkeypatch):
+    product = Product(name="Widget")
+    session.add(product)
+    await session.commit()
+    live_snapshot.replace(product.id, [(uuid4(), 100, 1)])
+
+    async def failing_commit(self):
+        raise RuntimeError("commit failed")
+
+    monkeypatch.setattr(AsyncSession, "commit", failing_commit)
+    with pytest.raises(RuntimeError):
+        await client.delete(f"/products/{product.id}")
+    assert product.id in live_snapshot
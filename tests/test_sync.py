@@ -2,8 +2,11 @@
 
 from uuid import uuid4
 
-from app.db.models import Offer, Product
+from sqlalchemy import event, select
+
+from app.db.models import Offer, OfferHistory, OfferPriceRange, OfferPriceRollup, Product
 from app.schemas import ExternalOffer
+from app.services.events import OfferEventKind
 from app.services.sync_service import OfferReconciler
 
 
@@ -94,3 +97,110 @@ async def test_full_reconcile(session):
 
     assert await session.get(Offer, new_id) is not None
     assert await session.get(Offer, stale_id) is None
+
+
+async def test_reconcile_bumps_version_only_on_change(session):
+    product = await _make_product(session)
+    offer_id = uuid4()
+    external = [ExternalOffer(id=offer_id, price=1000, items_in_stock=5)]
+
+    await OfferReconciler(session, product.id).reconcile(external)
+    await session.flush()
+    await session.refresh(product)
+    assert product.version == 2
+
+    await OfferReconciler(session, product.id).reconcile(external)
+    await session.flush()
+    await session.refresh(product)
+    assert product.version == 2
+
+
+async def test_reconcile_emits_change_events(session):
+    product = await _make_product(session)
+    kept_id, stale_id, new_id = uuid4(), uuid4(), uuid4()
+    session.add(Offer(id=kept_id, product_id=product.id, price=1000, items_in_stock=5))
+    session.add(Offer(id=stale_id, product_id=product.id, price=3000, items_in_stock=1))
+    await session.flush()
+
+    reconciler = OfferReconciler(session, product.id)
+    await reconciler.reconcile([
+        ExternalOffer(id=kept_id, price=900, items_in_stock=5),
+        ExternalOffer(id=new_id, price=5000, items_in_stock=10),
+    ])
+
+    events = {e.offer_id: e for e in reconciler.events}
+    assert events[kept_id].kind == OfferEventKind.UPDATED
+    assert (events[kept_id].old_price, events[kept_id].new_price) == (1000, 900)
+    assert events[new_id].kind == OfferEventKind.ADDED
+    assert events[stale_id].kind == OfferEventKind.REMOVED
+    assert events[stale_id].old_price == 3000
+
+
+async def test_reconcile_records_history_only_on_change(session):
+    product = await _make_product(session)
+    offer_id = uuid4()
+
+    await OfferReconciler(session, product.id).reconcile([ExternalOffer(id=offer_id, price=1000, items_in_stock=5)])
+    await session.flush()
+    await OfferReconciler(session, product.id).reconcile([ExternalOffer(id=offer_id, price=1000, items_in_stock=5)])
+    await session.flush()
+    await OfferReconciler(session, product.id).reconcile([ExternalOffer(id=offer_id, price=800, items_in_stock=5)])
+    await session.flush()
+
+    history = (await session.execute(
+        select(OfferHistory.price).where(OfferHistory.product_id == product.id).order_by(OfferHistory.id)
+    )).scalars().all()
+    assert history == [1000, 800]
+
+    [rollup] = (await session.execute(select(OfferPriceRollup))).scalars().all()
+    assert (rollup.min_price, rollup.max_price, rollup.samples) == (800, 1000, 2)
+
+
+async def test_reconcile_records_range_of_all_live_offers(session):
+    product = await _make_product(session)
+    cheap_id, changed_id, removed_id = uuid4(), uuid4(), uuid4()
+    session.add(Offer(id=cheap_id, product_id=product.id, price=100, items_in_stock=5))
+    session.add(Offer(id=changed_id, product_id=product.id, price=500, items_in_stock=5))
+    session.add(Offer(id=removed_id, product_id=product.id, price=900, items_in_stock=5))
+    await session.flush()
+
+    # Only one offer changes and one disappears; the untouched cheap offer still bounds the range
+    await OfferReconciler(session, product.id).reconcile([
+        ExternalOffer(id=cheap_id, price=100, items_in_stock=5),
+        ExternalOffer(id=changed_id, price=600, items_in_stock=5),
+    ])
+    await session.flush()
+
+    [price_range] = (await session.execute(select(OfferPriceRange))).scalars().all()
+    assert (price_range.min_price, price_range.max_price, price_range.changes) == (100, 600, 2)
+    [rollup] = (await session.execute(select(OfferPriceRollup))).scalars().all()
+    assert (rollup.close_min_price, rollup.close_max_price) == (100, 600)
+
+
+async def test_rollup_inserted_concurrently_is_merged(session, engine):
+    product = await _make_product(session)
+    await session.commit()
+    raced = False
+
+    def other_process_rolls_up_first(conn, cursor, statement, parameters, context, executemany) -> None:
+        # Another process reconciling the same product commits this hour's rollup right before ours
+        nonlocal raced
+        if statement.startswith("INSERT INTO offer_price_rollup") and not raced:
+            raced = True
+            cursor.execute(
+                "INSERT INTO offer_price_rollup (product_id, bucket_start, min_price, max_price, "
+                "close_min_price, close_max_price, samples) VALUES (?, ?, 500, 500, 500, 500, 3)",
+                (parameters[0], parameters[1]),
+            )
+
+    event.listen(engine.sync_engine, "before_cursor_execute", other_process_rolls_up_first)
+    try:
+        await OfferReconciler(session, product.id).reconcile([ExternalOffer(id=uuid4(), price=900, items_in_stock=1)])
+        await session.commit()
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", other_process_rolls_up_first)
+
+    assert raced
+    [rollup] = (await session.execute(select(OfferPriceRollup))).scalars().all()
+    assert (rollup.min_price, rollup.max_price, rollup.samples) == (500, 900, 4)
+    assert (rollup.close_min_price, rollup.close_max_price) == (900, 900)